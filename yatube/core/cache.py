@@ -0,0 +1,126 @@
+"""Кэш в отдельном файле SQLite, общий для всех процессов gunicorn."""
+import os
+import pickle
+import random
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+
+class SQLiteCache(BaseCache):
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = os.path.abspath(location)
+        self._local = threading.local()
+
+    @property
+    def _db(self):
+        # Соединение нельзя переносить через fork и делить между потоками.
+        if getattr(self._local, "pid", None) != os.getpid():
+            os.makedirs(os.path.dirname(self._path), exist_ok=True)
+            db = sqlite3.connect(self._path, timeout=5,
+                                 isolation_level=None,
+                                 check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)"
+            )
+            self._local.db = db
+            self._local.pid = os.getpid()
+        return self._local.db
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _dumps(self, value):
+        return pickle.dumps(value, self.pickle_protocol)
+
+    def _expired_clause(self):
+        return "(expires IS NOT NULL AND expires <= ?)", (time.time(),)
+
+    def get(self, key, default=None, version=None):
+        row = self._db.execute(
+            "SELECT value, expires FROM cache WHERE key = ?",
+            (self._key(key, version),),
+        ).fetchone()
+        if row is None or (row[1] is not None and row[1] <= time.time()):
+            return default
+        return pickle.loads(row[0])
+
+    def get_many(self, keys, version=None):
+        found = {}
+        for key in keys:
+            value = self.get(key, self, version)
+            if value is not self:
+                found[key] = value
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._db.execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires) "
+            "VALUES (?, ?, ?)",
+            (self._key(key, version), self._dumps(value),
+             self.get_backend_timeout(timeout)),
+        )
+        self._maybe_cull()
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        db = self._db
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            clause, params = self._expired_clause()
+            db.execute(f"DELETE FROM cache WHERE key = ? AND {clause}",
+                       (key, *params))
+            added = db.execute(
+                "INSERT OR IGNORE INTO cache (key, value, expires) "
+                "VALUES (?, ?, ?)",
+                (key, self._dumps(value), self.get_backend_timeout(timeout)),
+            ).rowcount == 1
+        finally:
+            db.execute("COMMIT")
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        clause, params = self._expired_clause()
+        return self._db.execute(
+            f"UPDATE cache SET expires = ? WHERE key = ? AND NOT {clause}",
+            (self.get_backend_timeout(timeout), self._key(key, version),
+             *params),
+        ).rowcount == 1
+
+    def delete(self, key, version=None):
+        self._db.execute("DELETE FROM cache WHERE key = ?",
+                         (self._key(key, version),))
+
+    def has_key(self, key, version=None):
+        return self.get(key, self, version) is not self
+
+    def clear(self):
+        self._db.execute("DELETE FROM cache")
+
+    def close(self, **kwargs):
+        # Соединение живет весь процесс, как у LocMemCache.
+        pass
+
+    def _maybe_cull(self):
+        if random.randrange(max(self._cull_frequency, 1) * 10):
+            return
+        db = self._db
+        clause, params = self._expired_clause()
+        db.execute(f"DELETE FROM cache WHERE {clause}", params)
+        count = db.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        if count > self._max_entries:
+            db.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache "
+                "ORDER BY expires IS NULL, expires LIMIT ?)",
+                (count // max(self._cull_frequency, 1),),
+            )
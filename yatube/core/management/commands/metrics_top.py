@@ -0,0 +1,119 @@
+import re
+import sys
+from urllib.request import Request, urlopen
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.metrics import PREFIX
+
+SAMPLE = re.compile(r"^(?P<metric>\w+)\{(?P<labels>[^}]*)\}\s+(?P<value>\S+)$")
+LABEL = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+SORT_KEYS = {
+    "total": lambda row: row["total"],
+    "mean": lambda row: row["mean"],
+    "p95": lambda row: row["p95"],
+    "queries": lambda row: row["queries"],
+}
+
+
+def parse(text):
+    """{представление: {метрика: {"sum", "count", "buckets"}}} из текста."""
+    views = {}
+    for line in text.splitlines():
+        match = SAMPLE.match(line)
+        if not match or not match["metric"].startswith(PREFIX + "_"):
+            continue
+        labels = dict(LABEL.findall(match["labels"]))
+        if "view" not in labels:
+            continue
+        metric, _, part = match["metric"][len(PREFIX) + 1:].rpartition("_")
+        stats = views.setdefault(labels["view"], {}).setdefault(
+            metric, {"sum": 0, "count": 0, "buckets": []})
+        value = float(match["value"])
+        if part == "bucket":
+            stats["buckets"].append((float(labels["le"]), value))
+        elif part in ("sum", "count"):
+            stats[part] = value
+    return views
+
+
+def quantile(buckets, q):
+    """Верхняя граница корзины, в которую попадает квантиль q."""
+    if not buckets:
+        return 0
+    target = buckets[-1][1] * q
+    for bound, total in buckets:
+        if total >= target:
+            return bound
+    return buckets[-1][0]
+
+
+def mean(stats, metric):
+    data = stats.get(metric)
+    return data["sum"] / data["count"] if data and data["count"] else 0
+
+
+def summarize(views):
+    rows = []
+    for view, stats in views.items():
+        duration = stats.get("duration_seconds")
+        if not duration or not duration["count"]:
+            continue
+        rows.append({
+            "view": view,
+            "requests": int(duration["count"]),
+            "total": duration["sum"],
+            "mean": mean(stats, "duration_seconds"),
+            "p95": quantile(duration["buckets"], 0.95),
+            "queries": mean(stats, "db_queries"),
+            "db": mean(stats, "db_duration_seconds"),
+            "render": mean(stats, "render_duration_seconds"),
+        })
+    return rows
+
+
+class Command(BaseCommand):
+    help = ("Показывает самые тяжелые представления по метрикам "
+            "MetricsMiddleware, снятым с /metrics/ или из файла.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--url", default=settings.METRICS_URL,
+            help="Адрес /metrics/ запущенного сервера. Метрики живут в "
+                 "процессе, поэтому при нескольких воркерах это срез "
+                 "одного из них.")
+        parser.add_argument("--token", default=settings.METRICS_TOKEN,
+                            help="Токен /metrics/ (METRICS_TOKEN).")
+        parser.add_argument("--file",
+                            help="Сохраненный ответ /metrics/ или - для stdin.")
+        parser.add_argument("--sort", choices=SORT_KEYS, default="total")
+        parser.add_argument("--limit", type=int, default=10)
+
+    def read(self, options):
+        if options["file"] == "-":
+            return sys.stdin.read()
+        if options["file"]:
+            with open(options["file"], encoding="utf-8") as stream:
+                return stream.read()
+        request = Request(options["url"])
+        if options["token"]:
+            request.add_header("Authorization", f"Bearer {options['token']}")
+        try:
+            with urlopen(request, timeout=10) as response:
+                return response.read().decode()
+        except OSError as error:
+            raise CommandError(f"{options['url']}: {error}")
+
+    def handle(self, *args, **options):
+        rows = summarize(parse(self.read(options)))
+        rows.sort(key=SORT_KEYS[options["sort"]], reverse=True)
+        self.stdout.write(
+            f"{'view':<32} {'req':>7} {'total s':>9} {'mean ms':>8} "
+            f"{'p95 ms':>8} {'queries':>7} {'db ms':>7} {'render ms':>9}")
+        for row in rows[:options["limit"]]:
+            self.stdout.write(
+                f"{row['view']:<32} {row['requests']:>7} "
+                f"{row['total']:>9.2f} {row['mean'] * 1000:>8.1f} "
+                f"{row['p95'] * 1000:>8.0f} {row['queries']:>7.1f} "
+                f"{row['db'] * 1000:>7.1f} {row['render'] * 1000:>9.1f}")
@@ -0,0 +1,186 @@
+"""Метрики представлений, безопасные для продакшена.
+
+MetricsMiddleware замеряет у каждого запроса время ответа, число и время
+SQL-запросов и время рендеринга шаблонов и копит их в гистограммах
+внутри процесса. /metrics/ отдает их в текстовом формате Prometheus,
+команда metrics_top показывает самые тяжелые представления.
+
+SQL считается через execute_wrapper и не требует DEBUG, рендер —
+через бэкенд TimedTemplates, который оборачивает только шаблон верхнего
+уровня: include и вложенные render_to_string не считаются дважды.
+"""
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextlib import ExitStack
+
+from django.db import connections
+from django.template.backends.django import DjangoTemplates, Template
+
+PREFIX = "yatube_view"
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5,
+                    10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+HISTOGRAMS = {
+    "duration_seconds": ("Время ответа представления", DURATION_BUCKETS),
+    "db_queries": ("Число SQL-запросов за запрос", QUERY_BUCKETS),
+    "db_duration_seconds": ("Время SQL-запросов за запрос",
+                            DURATION_BUCKETS),
+    "render_duration_seconds": ("Время рендеринга шаблонов за запрос",
+                                DURATION_BUCKETS),
+}
+
+_local = threading.local()
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """Пары (le, накопленное число) для экспорта, включая +Inf."""
+        total = 0
+        for bound, count in zip(self.buckets + ("+Inf",), self.counts):
+            total += count
+            yield bound, total
+
+
+class Registry:
+    """Гистограммы по именам представлений; общие для потоков процесса."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+        self._responses = Counter()
+
+    def observe(self, view, status, sample):
+        with self._lock:
+            histograms = self._views.get(view)
+            if histograms is None:
+                histograms = self._views[view] = {
+                    name: Histogram(buckets)
+                    for name, (_, buckets) in HISTOGRAMS.items()
+                }
+            for name, value in sample.items():
+                histograms[name].observe(value)
+            self._responses[view, status] += 1
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+            self._responses.clear()
+
+    def render(self):
+        """Текстовый формат Prometheus 0.0.4."""
+        lines = []
+        with self._lock:
+            for name, (help_text, _) in HISTOGRAMS.items():
+                metric = f"{PREFIX}_{name}"
+                lines.append(f"# HELP {metric} {help_text}")
+                lines.append(f"# TYPE {metric} histogram")
+                for view, histograms in sorted(self._views.items()):
+                    histogram = histograms[name]
+                    label = f'view="{escape(view)}"'
+                    for bound, total in histogram.cumulative():
+                        lines.append(
+                            f'{metric}_bucket{{{label},le="{bound}"}} {total}')
+                    lines.append(f"{metric}_sum{{{label}}} {histogram.sum}")
+                    lines.append(
+                        f"{metric}_count{{{label}}} {histogram.count}")
+            metric = f"{PREFIX}_responses_total"
+            lines.append(f"# HELP {metric} Ответы по представлениям и кодам")
+            lines.append(f"# TYPE {metric} counter")
+            for (view, status), count in sorted(self._responses.items()):
+                lines.append(f'{metric}{{view="{escape(view)}",'
+                             f'status="{status}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+def escape(value):
+    return (value.replace("\\", "\\\\").replace('"', '\\"')
+            .replace("\n", "\\n"))
+
+
+class RequestSample:
+    """Замеры одного запроса; сам служит execute_wrapper для SQL."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0
+        self.render_time = 0
+        self.rendering = False
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_time += time.perf_counter() - start
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        sample = getattr(_local, "sample", None)
+        # render_to_string внутри тега или панели не считается второй раз.
+        if sample is None or sample.rendering:
+            return super().render(context, request)
+        sample.rendering = True
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            sample.rendering = False
+            sample.render_time += time.perf_counter() - start
+
+
+class TimedTemplates(DjangoTemplates):
+    """DjangoTemplates, который засекает рендер шаблонов верхнего уровня."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return TimedTemplate(template.template, self)
+
+
+def view_name(request):
+    match = getattr(request, "resolver_match", None)
+    return match.view_name if match else "<unresolved>"
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        sample = RequestSample()
+        _local.sample = sample
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(sample))
+                response = self.get_response(request)
+        finally:
+            _local.sample = None
+        registry.observe(view_name(request), response.status_code, {
+            "duration_seconds": time.perf_counter() - start,
+            "db_queries": sample.queries,
+            "db_duration_seconds": sample.db_time,
+            "render_duration_seconds": sample.render_time,
+        })
+        return response
@@ -0,0 +1,116 @@
+"""Журнал медленных SQL-запросов с планом выполнения.
+
+SlowQueryMiddleware ставит execute_wrapper на соединения на время
+запроса. Запрос дольше SLOW_QUERY_THRESHOLD_MS пишется в логгер
+yatube.slow_queries вместе с именем представления, SQL и EXPLAIN
+(QUERY PLAN в SQLite), снятым сразу после выполнения. Параметры
+запросов (тексты, логины, email) пишутся только при
+SLOW_QUERY_LOG_PARAMS, иначе в журнале лишь их число.
+"""
+import logging
+import os
+import time
+from contextlib import ExitStack
+from logging.handlers import RotatingFileHandler
+
+from django.conf import settings
+from django.db import connections
+
+from .metrics import view_name
+
+logger = logging.getLogger("yatube.slow_queries")
+
+MAX_PARAMS_LENGTH = 1000
+
+
+class LogFileHandler(RotatingFileHandler):
+    """RotatingFileHandler, который создает каталог при первой записи.
+
+    Файл открывается лениво, так что импорт настроек ничего не пишет на
+    диск, а каталог журнала появляется, только когда он нужен.
+    """
+
+    def __init__(self, filename, *args, **kwargs):
+        kwargs["delay"] = True
+        super().__init__(filename, *args, **kwargs)
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.baseFilename), exist_ok=True)
+        return super()._open()
+
+
+def format_params(params):
+    if settings.SLOW_QUERY_LOG_PARAMS:
+        return repr(params)[:MAX_PARAMS_LENGTH]
+    count = len(params) if params is not None else 0
+    return f"<скрыто: {count}>"
+
+
+def explain(connection, sql, params):
+    """Строки плана SELECT-запроса или None для остальных запросов."""
+    if sql.lstrip()[:6].upper() != "SELECT":
+        return None
+    prefix = ("EXPLAIN QUERY PLAN" if connection.vendor == "sqlite"
+              else "EXPLAIN")
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f"{prefix} {sql}", params)
+            return [" ".join(str(value) for value in row)
+                    for row in cursor.fetchall()]
+    except Exception as error:
+        return [f"EXPLAIN недоступен: {error}"]
+
+
+class SlowQueryLogger:
+    def __init__(self, request, connection, threshold):
+        self.request = request
+        self.connection = connection
+        self.threshold = threshold
+        self.explaining = False
+
+    def __call__(self, execute, sql, params, many, context):
+        if self.explaining:
+            return execute(sql, params, many, context)
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            if elapsed >= self.threshold:
+                self.log(sql, params, many, elapsed)
+
+    def log(self, sql, params, many, elapsed):
+        # Представление известно только после разрешения URL, поэтому имя
+        # берется в момент запроса, а не при установке обертки.
+        plan = None
+        if not many:
+            self.explaining = True
+            try:
+                plan = explain(self.connection, sql, params)
+            finally:
+                self.explaining = False
+        lines = [
+            f"{elapsed:.1f} ms view={view_name(self.request)} "
+            f"path={self.request.path}",
+            f"SQL: {sql}",
+            f"params: {format_params(params)}",
+        ]
+        if plan:
+            lines.append("plan:")
+            lines.extend(f"  {row}" for row in plan)
+        logger.warning("\n".join(lines))
+
+
+class SlowQueryMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        threshold = settings.SLOW_QUERY_THRESHOLD_MS
+        if threshold is None:
+            return self.get_response(request)
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(
+                    SlowQueryLogger(request, connection, threshold)))
+            return self.get_response(request)
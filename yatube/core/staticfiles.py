@@ -0,0 +1,160 @@
+"""Статика с хешами в именах и заранее сжатыми копиями.
+
+CompressedManifestStaticFilesStorage после хеширования имен в
+collectstatic кладет рядом с каждым текстовым файлом .gz и, если
+установлен пакет brotli, .br. Копия не пишется, если сжатие почти
+ничего не дает.
+
+serve() отдает файлы из STATIC_ROOT, выбирая по Accept-Encoding
+сжатую копию; файлы с хешем в имени кэшируются браузером навсегда.
+Подключается при STATIC_SERVE; за nginx то же делают gzip_static и
+brotli_static.
+"""
+import gzip
+import mimetypes
+import os
+import posixpath
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import (ManifestStaticFilesStorage,
+                                                staticfiles_storage)
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE = (".css", ".js", ".svg", ".ico", ".json", ".map", ".txt",
+                ".xml", ".html")
+# Сжатая копия должна быть хотя бы на 5% меньше исходника.
+MIN_RATIO = 0.95
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+# Прямой запрос к сжатой копии отдается как архив: mimetypes для
+# "x.css.gz" вернул бы text/css, а Content-Encoding тут не ставится.
+ARCHIVE_TYPES = {"gzip": "application/gzip", "br": "application/x-brotli"}
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "public, max-age=0, must-revalidate"
+
+
+def compressors():
+    yield ".gz", lambda data: gzip.compress(data, 9, mtime=0)
+    if brotli is not None:
+        yield ".br", lambda data: brotli.compress(data, quality=11)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """ManifestStaticFilesStorage, который пишет .gz и .br копии."""
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name in sorted(set(self.hashed_files.values())):
+            for compressed in self.compress(name):
+                yield name, compressed, True
+
+    def compress(self, name):
+        """Пишет сжатые копии файла; возвращает их имена."""
+        if not name.endswith(COMPRESSIBLE):
+            return []
+        written = []
+        data = None
+        for suffix, compress in compressors():
+            # Имя с хешем однозначно задает содержимое.
+            if self.exists(name + suffix):
+                continue
+            if data is None:
+                with self.open(name) as source:
+                    data = source.read()
+            compressed = compress(data)
+            if len(compressed) > len(data) * MIN_RATIO:
+                continue
+            path = self.path(name + suffix)
+            with open(path + ".tmp", "wb") as target:
+                target.write(compressed)
+            os.replace(path + ".tmp", path)
+            written.append(name + suffix)
+        return written
+
+
+def accepted_encodings(header):
+    """Кодировки из Accept-Encoding, кроме отключенных через q=0."""
+    accepted = set()
+    for part in header.split(","):
+        coding, *params = part.split(";")
+        quality = 1
+        for param in params:
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0
+        if quality > 0:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+_hashed_names = (None, frozenset())
+
+
+def is_hashed(path):
+    """Есть ли путь среди имен с хешем из манифеста.
+
+    Множество имен строится один раз на загруженный манифест, а не
+    перебором hashed_files на каждый запрос.
+    """
+    global _hashed_names
+    hashed_files = getattr(staticfiles_storage, "hashed_files", None)
+    if not hashed_files:
+        return False
+    source, names = _hashed_names
+    if source is not hashed_files:
+        names = frozenset(hashed_files.values())
+        _hashed_names = (hashed_files, names)
+    return path in names
+
+
+def serve(request, path):
+    """Файл из STATIC_ROOT, по возможности заранее сжатый."""
+    path = posixpath.normpath(path).lstrip("/")
+    try:
+        fullpath = safe_join(settings.STATIC_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    if not os.path.isfile(fullpath):
+        raise Http404
+    accepted = accepted_encodings(
+        request.META.get("HTTP_ACCEPT_ENCODING", ""))
+    encoding = None
+    variants = False
+    filename = fullpath
+    for coding, suffix in ENCODINGS:
+        if not os.path.isfile(fullpath + suffix):
+            continue
+        variants = True
+        if encoding is None and coding in accepted:
+            encoding, filename = coding, fullpath + suffix
+    stat = os.stat(filename)
+    if not was_modified_since(request.META.get("HTTP_IF_MODIFIED_SINCE"),
+                              stat.st_mtime, stat.st_size):
+        response = HttpResponseNotModified()
+    else:
+        response = FileResponse(open(filename, "rb"))
+        # Тип исходника, а не архива, который угадал бы FileResponse.
+        content_type, archive = mimetypes.guess_type(fullpath)
+        if archive:
+            content_type = ARCHIVE_TYPES.get(archive)
+        response["Content-Type"] = content_type or "application/octet-stream"
+        response["Last-Modified"] = http_date(stat.st_mtime)
+        if encoding:
+            response["Content-Encoding"] = encoding
+    if variants:
+        response["Vary"] = "Accept-Encoding"
+    response["Cache-Control"] = IMMUTABLE if is_hashed(path) else REVALIDATE
+    return response
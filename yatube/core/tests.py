@@ -1,6 +1,29 @@
+import gzip
+import importlib
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
 from http import HTTPStatus
+from io import StringIO
 
-from django.test import TestCase
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+
+from .cache import SQLiteCache
+from .db import apply_sqlite_pragmas
+from .metrics import registry
+from .slow_queries import LogFileHandler, logger as slow_query_logger
+from .staticfiles import accepted_encodings, serve
 
 
 class ViewTestClass(TestCase):
@@ -11,3 +34,260 @@ class ViewTestClass(TestCase):
         response = self.client.get("/nonexist-page/")
         self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
         self.assertTemplateUsed(response, template)
+
+
+class SQLiteCacheTest(TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.cache = SQLiteCache(
+            os.path.join(self.cache_dir, "cache.sqlite3"), {})
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def test_set_get_delete(self):
+        """Кэш хранит, отдает и удаляет значения."""
+        self.cache.set("key", {"value": 1})
+        self.assertEqual(self.cache.get("key"), {"value": 1})
+        self.assertFalse(self.cache.add("key", "other"))
+        self.cache.delete("key")
+        self.assertIsNone(self.cache.get("key"))
+        self.assertTrue(self.cache.add("key", "other"))
+
+    def test_expired_values_are_missing(self):
+        """Просроченное значение не отдается и может быть добавлено."""
+        self.cache.set("key", "value", timeout=0.01)
+        time.sleep(0.02)
+        self.assertIsNone(self.cache.get("key"))
+        self.assertTrue(self.cache.add("key", "new"))
+        self.assertEqual(self.cache.get("key"), "new")
+
+    def test_shared_between_instances(self):
+        """Два экземпляра на одном файле видят общие данные."""
+        other = SQLiteCache(os.path.join(self.cache_dir, "cache.sqlite3"), {})
+        self.cache.set("key", "value")
+        self.assertEqual(other.get("key"), "value")
+
+
+class MetricsTest(TestCase):
+    def setUp(self):
+        registry.reset()
+
+    def test_requests_recorded_per_view(self):
+        """Middleware копит время, запросы и рендер по представлениям."""
+        self.client.get("/")
+        self.client.get("/")
+        text = self.client.get("/metrics/").content.decode()
+        self.assertIn('yatube_view_duration_seconds_count'
+                      '{view="posts:index"} 2', text)
+        self.assertIn('yatube_view_db_queries_bucket'
+                      '{view="posts:index",le="+Inf"} 2', text)
+        self.assertIn('yatube_view_render_duration_seconds_sum'
+                      '{view="posts:index"}', text)
+        self.assertIn('yatube_view_responses_total'
+                      '{view="posts:index",status="200"} 2', text)
+
+    def test_metrics_only_for_allowed_ips(self):
+        """Чужим адресам /metrics/ отвечает 404."""
+        response = self.client.get("/metrics/", REMOTE_ADDR="10.0.0.1")
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_metrics_behind_proxy_not_allowed_by_address(self):
+        """Запрос через прокси с локального адреса не пропускается."""
+        response = self.client.get("/metrics/",
+                                   HTTP_X_FORWARDED_FOR="10.0.0.1")
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    @override_settings(METRICS_TOKEN="token")
+    def test_metrics_token_required(self):
+        """С METRICS_TOKEN метрики отдаются только по токену."""
+        self.assertEqual(self.client.get("/metrics/").status_code,
+                         HTTPStatus.NOT_FOUND)
+        self.assertEqual(
+            self.client.get("/metrics/", HTTP_AUTHORIZATION="Bearer other")
+            .status_code, HTTPStatus.NOT_FOUND)
+        response = self.client.get("/metrics/",
+                                   HTTP_AUTHORIZATION="Bearer token",
+                                   HTTP_X_FORWARDED_FOR="10.0.0.1")
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_metrics_top_sorts_views(self):
+        """metrics_top выводит представления от самого тяжелого."""
+        self.client.get("/")
+        self.client.get("/about/author/")
+        scrape = self.client.get("/metrics/").content.decode()
+        path = os.path.join(tempfile.mkdtemp(), "metrics.txt")
+        self.addCleanup(shutil.rmtree, os.path.dirname(path))
+        with open(path, "w", encoding="utf-8") as stream:
+            stream.write(scrape)
+        out = StringIO()
+        call_command("metrics_top", file=path, sort="queries", stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertTrue(lines[1].startswith("posts:index"))
+        self.assertTrue(any(line.startswith("about:author")
+                            for line in lines))
+
+
+class SlowQueryLogTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        get_user_model().objects.create_user(username="author")
+
+    def setUp(self):
+        cache.clear()
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=0)
+    def test_slow_query_logged_with_plan(self):
+        """Медленный запрос пишется с представлением, SQL и планом."""
+        with self.assertLogs("yatube.slow_queries", "WARNING") as logs:
+            self.client.get("/profile/author/")
+        record = next(output for output in logs.output
+                      if "auth_user" in output and "plan:" in output)
+        self.assertIn("view=posts:profile", record)
+        self.assertIn("params: <скрыто: 1>", record)
+        self.assertNotIn("'author'", record)
+        self.assertRegex(record, r"SEARCH|SCAN")
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=0, SLOW_QUERY_LOG_PARAMS=True)
+    def test_params_logged_when_enabled(self):
+        """С SLOW_QUERY_LOG_PARAMS параметры запросов попадают в журнал."""
+        with self.assertLogs("yatube.slow_queries", "WARNING") as logs:
+            self.client.get("/profile/author/")
+        self.assertTrue(any("params: ('author'," in output
+                            for output in logs.output))
+
+    def test_log_directory_created_on_first_write(self):
+        """Каталог журнала появляется при первой записи, а не раньше."""
+        logs_dir = os.path.join(tempfile.mkdtemp(), "logs")
+        self.addCleanup(shutil.rmtree, os.path.dirname(logs_dir))
+        handler = LogFileHandler(os.path.join(logs_dir, "slow.log"))
+        self.addCleanup(handler.close)
+        self.assertFalse(os.path.exists(logs_dir))
+        handler.emit(logging.makeLogRecord({"msg": "slow"}))
+        self.assertTrue(os.path.exists(os.path.join(logs_dir, "slow.log")))
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=10 ** 6)
+    def test_fast_queries_not_logged(self):
+        """Запросы быстрее порога не попадают в журнал."""
+        with mock.patch.object(slow_query_logger, "warning") as warning:
+            self.client.get("/profile/author/")
+        warning.assert_not_called()
+
+
+class ProductionSettingsTest(TestCase):
+    @staticmethod
+    def load_production(**environ):
+        sys.modules.pop("yatube.settings_production", None)
+        # Пустое значение — переменная не задана.
+        with mock.patch.dict(os.environ, environ):
+            for name, value in environ.items():
+                if not value:
+                    del os.environ[name]
+            return importlib.import_module("yatube.settings_production")
+
+    def test_production_settings(self):
+        """Продакшен-настройки без отладки и с кэшем шаблонов."""
+        production = self.load_production(YATUBE_SECRET_KEY="secret",
+                                          YATUBE_CACHE="")
+        self.assertEqual(production.SECRET_KEY, "secret")
+        self.assertFalse(production.DEBUG)
+        self.assertNotIn("debug_toolbar", production.INSTALLED_APPS)
+        self.assertFalse(any("debug_toolbar" in middleware
+                             for middleware in production.MIDDLEWARE))
+        self.assertGreater(production.DATABASES["default"]["CONN_MAX_AGE"],
+                           0)
+        loader, _ = production.TEMPLATES[0]["OPTIONS"]["loaders"][0]
+        self.assertEqual(loader, "django.template.loaders.cached.Loader")
+        self.assertEqual(production.CACHES["default"]["BACKEND"],
+                         "core.cache.SQLiteCache")
+        self.assertFalse(production.CACHE_SINGLE_PROCESS)
+        self.assertEqual(production.METRICS_ALLOWED_IPS, [])
+
+    def test_secret_key_required(self):
+        """Без YATUBE_SECRET_KEY продакшен-настройки не загружаются."""
+        with self.assertRaises(ImproperlyConfigured):
+            self.load_production(YATUBE_SECRET_KEY="")
+
+    @override_settings(SQLITE_PRAGMAS={"cache_size": -1234})
+    def test_sqlite_pragmas_applied(self):
+        """PRAGMA из настроек применяются к соединению."""
+        def cache_size():
+            with connection.cursor() as cursor:
+                cursor.execute("PRAGMA cache_size")
+                return cursor.fetchone()[0]
+
+        default = cache_size()
+        apply_sqlite_pragmas(None, connection)
+        self.assertEqual(cache_size(), -1234)
+        with override_settings(SQLITE_PRAGMAS={"cache_size": default}):
+            apply_sqlite_pragmas(None, connection)
+
+
+STATIC_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(
+    STATIC_ROOT=STATIC_ROOT,
+    STATICFILES_STORAGE=(
+        "core.staticfiles.CompressedManifestStaticFilesStorage"),
+)
+class CompressedStaticFilesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        call_command("collectstatic", interactive=False, verbosity=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(STATIC_ROOT, ignore_errors=True)
+
+    def get(self, path, **headers):
+        request = RequestFactory().get(f"/static/{path}", **headers)
+        return serve(request, path)
+
+    def test_hashed_files_compressed(self):
+        """collectstatic пишет сжатую копию файла с хешем в имени."""
+        name = staticfiles_storage.stored_name("css/bootstrap.min.css")
+        self.assertRegex(name, r"^css/bootstrap\.min\.[0-9a-f]{12}\.css$")
+        with open(os.path.join(STATIC_ROOT, name), "rb") as original, \
+                gzip.open(os.path.join(STATIC_ROOT, name + ".gz")) as copy:
+            self.assertEqual(copy.read(), original.read())
+        # PNG уже сжат, копия не нужна.
+        logo = staticfiles_storage.stored_name("img/logo.png")
+        self.assertFalse(os.path.exists(
+            os.path.join(STATIC_ROOT, logo + ".gz")))
+
+    def test_serve_picks_compressed_variant(self):
+        """Клиенту с gzip отдается .gz, остальным — исходный файл."""
+        name = staticfiles_storage.stored_name("css/bootstrap.min.css")
+        response = self.get(name, HTTP_ACCEPT_ENCODING="gzip, deflate")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(response["Content-Type"], "text/css")
+        self.assertEqual(response["Vary"], "Accept-Encoding")
+        self.assertIn("immutable", response["Cache-Control"])
+        compressed = b"".join(response.streaming_content)
+
+        response = self.get(name, HTTP_ACCEPT_ENCODING="gzip;q=0")
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertEqual(gzip.decompress(compressed),
+                         b"".join(response.streaming_content))
+
+    def test_compressed_copy_served_as_archive(self):
+        """Прямой запрос к .gz отдается как архив, без Content-Encoding."""
+        name = staticfiles_storage.stored_name("css/bootstrap.min.css")
+        response = self.get(name + ".gz", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Type"], "application/gzip")
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertIn("must-revalidate", response["Cache-Control"])
+
+    def test_unhashed_name_revalidated(self):
+        """Файл без хеша в имени браузер перепроверяет."""
+        response = self.get("css/bootstrap.min.css")
+        self.assertIn("must-revalidate", response["Cache-Control"])
+
+    def test_accepted_encodings(self):
+        """q=0 исключает кодировку."""
+        self.assertEqual(accepted_encodings("br;q=0, GZIP;q=0.5, identity"),
+                         {"gzip", "identity"})
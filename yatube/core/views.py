@@ -1,6 +1,12 @@
 # core/views.py
+import hmac
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
 from django.shortcuts import render
 
+from .metrics import registry
+
 
 def page_not_found(request, exception):
     return render(request, "core/404.html", {"path": request.path}, status=404)
@@ -8,3 +14,27 @@ def page_not_found(request, exception):
 
 def csrf_failure(request, reason=""):
     return render(request, "core/403csrf.html")
+
+
+def metrics_allowed(request):
+    """Токен из METRICS_TOKEN или прямой запрос с METRICS_ALLOWED_IPS.
+
+    За прокси REMOTE_ADDR — адрес самого прокси, поэтому запросам с
+    X-Forwarded-For список адресов не помогает: нужен токен.
+    """
+    token = settings.METRICS_TOKEN
+    if token:
+        header = request.META.get("HTTP_AUTHORIZATION", "")
+        return hmac.compare_digest(header.encode(),
+                                   f"Bearer {token}".encode())
+    if "HTTP_X_FORWARDED_FOR" in request.META:
+        return False
+    return request.META.get("REMOTE_ADDR") in settings.METRICS_ALLOWED_IPS
+
+
+def metrics(request):
+    """Метрики процесса для Prometheus; см. metrics_allowed()."""
+    if not metrics_allowed(request):
+        raise Http404
+    return HttpResponse(registry.render(),
+                        content_type="text/plain; version=0.0.4; charset=utf-8")
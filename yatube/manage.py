@@ -3,7 +3,11 @@ import sys
 
 
 def main():
-    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', (
+        'yatube.settings_production'
+        if os.environ.get('YATUBE_ENV') == 'production'
+        else 'yatube.settings'
+    ))
     try:
         from django.core.management import execute_from_command_line
     except ImportError as exc:
@@ -1,5 +1,6 @@
 from django.contrib import admin
 
+from . import search
 from .models import Group, Post
 
 
@@ -10,6 +11,15 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ("pub_date",)
     empty_value_display = "-пусто-"
 
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term or not search.is_supported():
+            return super().get_search_results(request, queryset,
+                                              search_term)
+        if not search.fts_query(search_term):
+            # В запросе нет слов: MATCH '' — синтаксическая ошибка FTS5.
+            return queryset.none(), False
+        return queryset.filter(id__in=search.matching_ids(search_term)), False
+
 
 admin.site.register(Post, PostAdmin)
 admin.site.register(Group)
@@ -0,0 +1,189 @@
+"""Read-only JSON API для мобильных клиентов.
+
+Ленты отдаются keyset-страницами (after/before, как в HTML), параметр
+fields оставляет в ответе только нужные поля, а из базы выбираются
+только их столбцы. JSON пишется без пробелов и без \\u-экранирования.
+"""
+from functools import wraps
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import JsonResponse
+
+from .caching import FEED, conditional_page, scope
+from .models import Comment, Group, Post, TimelineEntry, User
+from .paginators import CursorPaginator
+from .views import author_scopes, group_scopes, post_scopes
+
+MAX_LIMIT = 100
+POST_FIELDS = {
+    "id": "id",
+    "text": "text",
+    "pub_date": "pub_date",
+    "edited": "edited",
+    "author": "author__username",
+    "group": "group__slug",
+    "image": "image",
+    "comments_count": "comments_count",
+}
+COMMENT_FIELDS = {
+    "id": "id",
+    "post": "post_id",
+    "author": "author__username",
+    "text": "text",
+    "created": "created",
+}
+GROUP_FIELDS = {
+    "slug": "slug",
+    "title": "title",
+    "description": "description",
+    "posts_count": "posts_count",
+}
+
+
+class ApiError(Exception):
+    def __init__(self, detail, status=400):
+        super().__init__(detail)
+        self.detail = detail
+        self.status = status
+
+
+def respond(data, status=200):
+    return JsonResponse(data, status=status, json_dumps_params={
+        "separators": (",", ":"), "ensure_ascii": False})
+
+
+def api_view(view):
+    """Ошибки API — тоже JSON, а не HTML-страницы."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except ApiError as error:
+            return respond({"detail": error.detail}, error.status)
+
+    return wrapper
+
+
+def selected_fields(request, spec):
+    value = request.GET.get("fields")
+    if not value:
+        return list(spec)
+    names = [name.strip() for name in value.split(",") if name.strip()]
+    unknown = [name for name in names if name not in spec]
+    if unknown:
+        raise ApiError(f"Неизвестные поля: {', '.join(unknown)}; "
+                       f"доступны: {', '.join(spec)}")
+    return names
+
+
+def page_size(request):
+    try:
+        limit = int(request.GET.get("limit", settings.POSTS_TO_OUTPUT))
+    except ValueError:
+        raise ApiError("limit должен быть числом")
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def serialize(row, names, spec, prefix=""):
+    item = {}
+    for name in names:
+        value = row[prefix + spec[name]]
+        if name == "image":
+            value = default_storage.url(value) if value else None
+        item[name] = value
+    return item
+
+
+def cursor_list(queryset, spec, names, limit, after=None, before=None,
+                keys=("pub_date", "id"), prefix=""):
+    """Keyset-страница queryset.values() только с нужными столбцами."""
+    lookups = {prefix + spec[name] for name in names} | set(keys)
+    paginator = CursorPaginator(queryset.values(*lookups), limit, keys)
+    page = paginator.cursor_page(after=after, before=before)
+    return {
+        "results": [serialize(row, names, spec, prefix)
+                    for row in page.object_list],
+        "next": page.next_cursor,
+        "previous": page.previous_cursor,
+    }
+
+
+def feed(request, queryset, **kwargs):
+    return respond(cursor_list(
+        queryset, POST_FIELDS, selected_fields(request, POST_FIELDS),
+        page_size(request), request.GET.get("after"),
+        request.GET.get("before"), **kwargs))
+
+
+def comments_page(post_id, limit, after=None, before=None,
+                  names=tuple(COMMENT_FIELDS)):
+    return cursor_list(Comment.objects.filter(post_id=post_id),
+                       COMMENT_FIELDS, names, limit, after, before,
+                       keys=("created", "id"))
+
+
+def get_or_404(queryset, **lookups):
+    obj = queryset.filter(**lookups).first()
+    if obj is None:
+        raise ApiError("Не найдено", status=404)
+    return obj
+
+
+@conditional_page(lambda request: [FEED])
+@api_view
+def posts(request):
+    return feed(request, Post.objects.all())
+
+
+@conditional_page(lambda request: [FEED])
+@api_view
+def groups(request):
+    names = selected_fields(request, GROUP_FIELDS)
+    rows = Group.objects.order_by("-posts_count", "slug").values(
+        *{GROUP_FIELDS[name] for name in names})
+    return respond({"results": [serialize(row, names, GROUP_FIELDS)
+                                for row in rows]})
+
+
+@conditional_page(group_scopes)
+@api_view
+def group_posts(request, slug):
+    group = get_or_404(Group.objects.only("pk"), slug=slug)
+    return feed(request, group.posts.all())
+
+
+@conditional_page(author_scopes)
+@api_view
+def profile_posts(request, username):
+    author = get_or_404(User.objects.only("pk"), username=username)
+    return feed(request, author.posts.all())
+
+
+@api_view
+def follow_posts(request):
+    if not request.user.is_authenticated:
+        raise ApiError("Нужна авторизация", status=401)
+    return feed(request, TimelineEntry.objects.filter(user=request.user),
+                keys=("pub_date", "post_id"), prefix="post__")
+
+
+@conditional_page(post_scopes)
+@api_view
+def post_detail(request, post_id):
+    """Пост и первая страница его комментариев, новые первыми."""
+    names = selected_fields(request, POST_FIELDS)
+    row = get_or_404(Post.objects.values(
+        *{POST_FIELDS[name] for name in names}), pk=post_id)
+    item = serialize(row, names, POST_FIELDS)
+    item["comments"] = comments_page(post_id, settings.POSTS_TO_OUTPUT)
+    return respond(item)
+
+
+@conditional_page(lambda request, post_id: [scope("post", post_id)])
+@api_view
+def post_comments(request, post_id):
+    get_or_404(Post.objects.only("pk"), pk=post_id)
+    return respond(comments_page(
+        post_id, page_size(request), request.GET.get("after"),
+        request.GET.get("before"), selected_fields(request, COMMENT_FIELDS)))
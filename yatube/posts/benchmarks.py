@@ -0,0 +1,175 @@
+"""Общие помощники для команд bench_*: временная база, сидинг, замеры."""
+import os
+import random
+import tempfile
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection
+from django.test import Client, override_settings
+from faker import Faker
+
+from .models import Comment, Follow, Group, Post, User
+
+BATCH_SIZE = 500
+# Адрес не из INTERNAL_IPS, чтобы в замеры не попадал debug_toolbar.
+VISITOR_ADDR = "203.0.113.10"
+
+
+@contextmanager
+def isolated_database(on_disk=False):
+    """Создает чистую тестовую базу и удаляет ее после замеров.
+
+    on_disk нужен, когда базу читают дочерние процессы: SQLite в памяти
+    не переживает fork.
+    """
+    old_name = connection.settings_dict["NAME"]
+    old_test_name = connection.settings_dict["TEST"].get("NAME")
+    if on_disk:
+        handle, path = tempfile.mkstemp(suffix=".sqlite3")
+        os.close(handle)
+        connection.settings_dict["TEST"]["NAME"] = path
+    connection.creation.create_test_db(verbosity=0, autoclobber=True,
+                                       serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        connection.settings_dict["TEST"]["NAME"] = old_test_name
+
+
+@contextmanager
+def isolated_cache(backend=None):
+    """Подменяет кэш по умолчанию копией во временном каталоге.
+
+    Замеры чистят кэш и наполняют его страницами из временной базы;
+    настоящий кэш запущенного сервера они трогать не должны.
+    """
+    backend = dict(backend or settings.CACHES["default"])
+    with tempfile.TemporaryDirectory() as directory:
+        if backend["BACKEND"].endswith(".LocMemCache"):
+            backend["LOCATION"] = f"bench:{directory}"
+        elif backend.get("LOCATION"):
+            backend["LOCATION"] = os.path.join(
+                directory, os.path.basename(backend["LOCATION"]))
+        with override_settings(CACHES={"default": backend}):
+            yield backend
+
+
+def visitor_client():
+    return Client(REMOTE_ADDR=VISITOR_ADDR)
+
+
+def timed(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def percentile(samples, rank):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(rank / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summary(samples):
+    return {
+        "p50": percentile(samples, 50),
+        "p95": percentile(samples, 95),
+        "p99": percentile(samples, 99),
+    }
+
+
+def format_ms(stats):
+    return "  ".join(f"{key}={value * 1000:.3f}ms"
+                     for key, value in stats.items())
+
+
+def seed_users(count, prefix="bench"):
+    User.objects.bulk_create(
+        (User(username=f"{prefix}_{i}") for i in range(count)),
+        batch_size=BATCH_SIZE,
+    )
+    return list(User.objects.filter(
+        username__startswith=f"{prefix}_").values_list("id", flat=True))
+
+
+def seed_follows(user_ids, per_user, seed=0):
+    """Каждый пользователь подписывается на per_user случайных авторов."""
+    rnd = random.Random(seed)
+    follows = []
+    per_user = min(per_user, len(user_ids) - 1)
+    for user_id in user_ids:
+        authors = set()
+        while len(authors) < per_user:
+            author_id = rnd.choice(user_ids)
+            if author_id != user_id:
+                authors.add(author_id)
+        follows.extend(Follow(user_id=user_id, author_id=author_id)
+                       for author_id in authors)
+        if len(follows) >= BATCH_SIZE:
+            Follow.objects.bulk_create(follows)
+            follows = []
+    Follow.objects.bulk_create(follows)
+    return list(Follow.objects.values_list("user_id", "author_id"))
+
+
+def seed_groups(count, prefix="bench"):
+    Group.objects.bulk_create(
+        (Group(title=f"{prefix} {i}", slug=f"{prefix}-{i}",
+               description=f"{prefix} group {i}") for i in range(count)),
+        batch_size=BATCH_SIZE,
+    )
+    return list(Group.objects.filter(
+        slug__startswith=f"{prefix}-").values_list("id", flat=True))
+
+
+def faker(seed=0):
+    """Генератор правдоподобного русского текста из Faker."""
+    fake = Faker("ru_RU")
+    fake.seed_instance(seed)
+    return fake
+
+
+def seed_posts(author_ids, count, group_ids=(), seed=0, fake=None):
+    """Посты случайных авторов; примерно половина попадает в группы.
+
+    С fake тексты берутся из Faker: так похожи на настоящие длины и
+    словарь для поиска, но сидинг заметно медленнее.
+    """
+    rnd = random.Random(seed)
+    group_choices = list(group_ids) + [None] * len(group_ids)
+    posts = []
+    for i in range(count):
+        posts.append(Post(
+            author_id=rnd.choice(author_ids),
+            group_id=rnd.choice(group_choices) if group_choices else None,
+            text=(fake.paragraph(nb_sentences=rnd.randint(1, 8)) if fake
+                  else f"Тестовый пост {i} " * rnd.randint(1, 20)),
+        ))
+        if len(posts) >= BATCH_SIZE:
+            Post.objects.bulk_create(posts)
+            posts = []
+    Post.objects.bulk_create(posts)
+
+
+def seed_comments(post_ids, author_ids, count, seed=0, fake=None):
+    """Комментарии к случайным постам; часть постов обсуждают чаще."""
+    rnd = random.Random(seed)
+    # Небольшая часть постов собирает большинство комментариев.
+    hot = rnd.sample(post_ids, max(1, len(post_ids) // 100))
+    comments = []
+    for i in range(count):
+        comments.append(Comment(
+            post_id=rnd.choice(hot if rnd.random() < 0.5 else post_ids),
+            author_id=rnd.choice(author_ids),
+            text=fake.sentence() if fake else f"Комментарий {i}",
+        ))
+        if len(comments) >= BATCH_SIZE:
+            Comment.objects.bulk_create(comments)
+            comments = []
+    Comment.objects.bulk_create(comments)
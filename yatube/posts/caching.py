@@ -0,0 +1,189 @@
+"""Кэш фрагментов и страниц, метки изменений для условных GET-запросов.
+
+Метка области (вся лента, группа, автор, пост) — время последнего
+изменения в ней. Сигналы обновляют метки после коммита, а страницы
+строят из них ETag, Last-Modified и ключ кэша без запросов к постам.
+
+Метки имеют смысл, только если их видят все воркеры. Кэш процесса
+(locmem) у каждого воркера свой, и запись отметилась бы лишь в одном
+из них, поэтому с ним условные ответы, кэш страниц, лент и счетчиков
+включены только при CACHE_SINGLE_PROCESS (см. markers_shared).
+"""
+import hashlib
+import time
+from datetime import datetime, timezone
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.db import transaction
+from django.views.decorators.http import condition
+
+
+POST_CARD_FRAGMENT = "post_card"
+SCOPE_PREFIX = "posts:changed"
+PAGE_PREFIX = "posts:page"
+PROCESS_LOCAL_BACKENDS = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+# Меняется после массовых операций в обход сигналов и сбрасывает все.
+EPOCH = "epoch"
+FEED = "feed"
+
+
+def post_card_key(post):
+    """Ключ фрагмента {% cache %} карточки из includes/post_list.html.
+
+    Имя картинки и флаг готовности миниатюр входят в ключ: карточка с
+    заглушкой сменяется карточкой с картинкой, как только фоновая
+    генерация закончится. Логин и имя автора — тоже: карточка показывает
+    их, а правка пользователя не меняет версию его постов.
+    """
+    return make_template_fragment_key(
+        POST_CARD_FRAGMENT,
+        [post.pk, post.cache_version, post.image.name,
+         post.thumbnails_ready, post.author.username,
+         post.author.get_full_name()],
+    )
+
+
+def forget_post_card(post):
+    cache.delete(post_card_key(post))
+
+
+def markers_shared():
+    """Видят ли все процессы сервера одни и те же метки изменений."""
+    return (settings.CACHE_SINGLE_PROCESS
+            or settings.CACHES["default"]["BACKEND"]
+            not in PROCESS_LOCAL_BACKENDS)
+
+
+def scope(name, value=None):
+    return f"{name}:{value}" if value is not None else name
+
+
+def scope_key(name):
+    # В username и slug бывают символы, недопустимые в ключах memcached.
+    return f"{SCOPE_PREFIX}:{hashlib.md5(name.encode()).hexdigest()}"
+
+
+def touch(*scopes):
+    """Отмечает изменение областей сразу и еще раз после коммита.
+
+    Страница, отрисованная между записью и коммитом, видит старые
+    данные; повторная метка после коммита не дает ей закрепиться в
+    кэше и в ETag.
+    """
+    def set_times():
+        now = time.time()
+        cache.set_many({scope_key(name): now for name in scopes},
+                       timeout=None)
+
+    set_times()
+    transaction.on_commit(set_times)
+
+
+def touch_posts(posts):
+    """Отмечает изменение страниц, где видны посты из queryset."""
+    scopes = {FEED}
+    for pk, username, slug in posts.values_list(
+            "pk", "author__username", "group__slug"):
+        scopes.update({scope("post", pk), scope("author", username)})
+        if slug:
+            scopes.add(scope("group", slug))
+    touch(*scopes)
+
+
+def changed_at(*scopes):
+    """Время последнего изменения областей (unix time).
+
+    Метки без значения (новый или очищенный кэш) считаются
+    изменившимися сейчас: лишний 200 лучше устаревшего 304.
+    """
+    keys = [scope_key(name) for name in (EPOCH, *scopes)]
+    found = cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        now = time.time()
+        for key in missing:
+            cache.add(key, now, timeout=None)
+        found.update(cache.get_many(missing))
+    return max(found.get(key, time.time()) for key in keys)
+
+
+def conditional_page(scopes_for):
+    """Условный GET и кэш страниц гостей для представления.
+
+    scopes_for(request, **kwargs) возвращает области страницы или None,
+    если проверять нечего (например, объекта нет и будет 404).
+
+    Без общих меток (см. markers_shared) представление вызывается как есть.
+
+    ETag зависит от пользователя: страницы гостей и авторов различаются.
+    Готовые страницы гостей кэшируются под ключом из адреса и меток
+    областей, поэтому новая метка сразу делает старую копию
+    недостижимой, а TTL лишь ограничивает время жизни мусора.
+    """
+    def stamp(request, **kwargs):
+        if not hasattr(request, "_posts_changed_at"):
+            scopes = scopes_for(request, **kwargs)
+            request._posts_changed_at = (
+                None if scopes is None else changed_at(*scopes))
+        return request._posts_changed_at
+
+    def etag(request, *args, **kwargs):
+        changed = stamp(request, **kwargs)
+        if changed is None:
+            return None
+        return hashlib.md5(
+            f"{changed:.6f}:{request.user.pk}".encode()).hexdigest()
+
+    def last_modified(request, *args, **kwargs):
+        changed = stamp(request, **kwargs)
+        if changed is None:
+            return None
+        return datetime.fromtimestamp(changed, tz=timezone.utc)
+
+    def decorator(view):
+        @wraps(view)
+        def cached_view(request, *args, **kwargs):
+            changed = stamp(request, **kwargs)
+            if (request.method != "GET" or changed is None
+                    or request.user.is_authenticated
+                    or not settings.PAGE_CACHE_TIMEOUT):
+                return view(request, *args, **kwargs)
+            key = page_key(request, changed)
+            response = cache.get(key)
+            if response is not None:
+                return response
+            response = view(request, *args, **kwargs)
+            if (response.status_code == 200 and not response.cookies
+                    and not response.streaming):
+                def store(rendered):
+                    cache.set(key, rendered, settings.PAGE_CACHE_TIMEOUT)
+
+                if hasattr(response, "add_post_render_callback"):
+                    response.add_post_render_callback(store)
+                else:
+                    store(response)
+            return response
+
+        conditional_view = condition(
+            etag_func=etag, last_modified_func=last_modified)(cached_view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not markers_shared():
+                return view(request, *args, **kwargs)
+            return conditional_view(request, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def page_key(request, changed):
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f"{PAGE_PREFIX}:{path}:{changed:.6f}"
@@ -0,0 +1,263 @@
+"""Буферизованная запись комментариев (COMMENT_QUEUE).
+
+Во время всплесков каждый INSERT комментария ждет блокировку записи
+SQLite. В буферизованном режиме add_comment только дописывает строку в
+локальный журнал (append-only JSONL, fsync), а фоновый поток раз в
+COMMENT_FLUSH_INTERVAL секунд переносит накопленное в Comment одним
+bulk_create. Команда flush_comments делает то же вручную.
+
+Писатели и сборщик разных процессов согласуются через flock: сборщик
+переименовывает журнал и забирает его под эксклюзивной блокировкой,
+а писатель, получивший блокировку уже переименованного файла,
+открывает журнал заново. Повторная обработка файла после сбоя не
+дублирует комментарии: уже вставленные (post, author, created)
+пропускаются.
+
+Автор видит свои еще не перенесенные комментарии: они хранятся в его
+сессии до появления в базе (см. remember() и pending()).
+"""
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import AutoField
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import caching, counters
+from .models import Comment, Post, User
+
+logger = logging.getLogger(__name__)
+
+QUEUE_NAME = "comments.jsonl"
+FLUSHING_SUFFIX = ".flushing"
+SESSION_KEY = "pending_comments"
+
+_flusher = None
+_flusher_lock = threading.Lock()
+
+
+def queue_path():
+    return os.path.join(settings.COMMENT_QUEUE_DIR, QUEUE_NAME)
+
+
+def _append(line):
+    os.makedirs(settings.COMMENT_QUEUE_DIR, exist_ok=True)
+    path = queue_path()
+    while True:
+        with open(path, "a", encoding="utf-8") as stream:
+            fcntl.flock(stream, fcntl.LOCK_EX)
+            try:
+                # Файл могли забрать на перенос, пока ждали блокировку.
+                if os.fstat(stream.fileno()).st_ino != _inode(path):
+                    continue
+                stream.write(line)
+                stream.flush()
+                os.fsync(stream.fileno())
+                return
+            finally:
+                fcntl.flock(stream, fcntl.LOCK_UN)
+
+
+def _inode(path):
+    try:
+        return os.stat(path).st_ino
+    except FileNotFoundError:
+        return None
+
+
+def enqueue(post_id, author, text):
+    """Ставит комментарий в журнал и возвращает его запись."""
+    record = {
+        "post": post_id,
+        "author": author.pk,
+        "text": text,
+        "created": timezone.now().isoformat(),
+    }
+    _append(json.dumps(record, ensure_ascii=False) + "\n")
+    start_flusher()
+    # Страница поста автора меняется сразу: ETag не должен дать 304.
+    caching.touch(caching.scope("post", post_id))
+    return record
+
+
+def _read(path):
+    with open(path, encoding="utf-8") as stream:
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _bulk_insert(comments):
+    """bulk_create с датами из журнала.
+
+    raw=True берет created из объектов, не вызывая pre_save поля с
+    auto_now_add. keep_dates() здесь не годится: он меняет общие
+    метаданные модели, и Comment, сохраненный в это время другим
+    потоком, остался бы без даты.
+    """
+    fields = [field for field in Comment._meta.concrete_fields
+              if not isinstance(field, AutoField)]
+    batch_size = max(connection.ops.bulk_batch_size(fields, comments), 1)
+    for start in range(0, len(comments), batch_size):
+        Comment.objects._insert(comments[start:start + batch_size],
+                                fields=fields, raw=True)
+
+
+def _insert(records):
+    """Вставляет записи, которых еще нет в базе; возвращает число новых."""
+    if not records:
+        return 0
+    # Пост или автор могли удалить, пока комментарий ждал в журнале.
+    posts = set(Post.objects.filter(
+        pk__in={record["post"] for record in records}
+    ).values_list("pk", flat=True))
+    users = set(User.objects.filter(
+        pk__in={record["author"] for record in records}
+    ).values_list("pk", flat=True))
+    records = [record for record in records
+               if record["post"] in posts and record["author"] in users]
+    created = [parse_datetime(record["created"]) for record in records]
+    existing = set(Comment.objects.filter(
+        post_id__in={record["post"] for record in records},
+        created__in=created,
+    ).values_list("post_id", "author_id", "created"))
+    comments = [
+        Comment(post_id=record["post"], author_id=record["author"],
+                text=record["text"], created=when)
+        for record, when in zip(records, created)
+        if (record["post"], record["author"], when) not in existing
+    ]
+    # bulk_create не шлет сигналов: счетчики и метки обновляем сами.
+    with transaction.atomic():
+        _bulk_insert(comments)
+        per_post = {}
+        for comment in comments:
+            per_post[comment.post_id] = per_post.get(comment.post_id, 0) + 1
+        for post_id, count in per_post.items():
+            counters.bump_post_comments(post_id, count)
+    if per_post:
+        caching.touch(*(caching.scope("post", post_id)
+                        for post_id in per_post))
+    return len(comments)
+
+
+def _claim():
+    """Забирает текущий журнал под новым именем или возвращает None."""
+    path = queue_path()
+    if not os.path.exists(path):
+        return None
+    claimed = f"{path}.{os.getpid()}.{time.time():.6f}{FLUSHING_SUFFIX}"
+    try:
+        os.rename(path, claimed)
+    except FileNotFoundError:
+        return None
+    return claimed
+
+
+def _pending_files():
+    directory = settings.COMMENT_QUEUE_DIR
+    if not os.path.isdir(directory):
+        return []
+    return sorted(
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if name.endswith(FLUSHING_SUFFIX)
+    )
+
+
+def flush(batch_size=None):
+    """Переносит журнал в Comment; возвращает число новых комментариев.
+
+    Сначала дообрабатываются файлы, брошенные упавшим сборщиком.
+    """
+    batch_size = batch_size or settings.COMMENT_FLUSH_BATCH
+    os.makedirs(settings.COMMENT_QUEUE_DIR, exist_ok=True)
+    lock_path = os.path.join(settings.COMMENT_QUEUE_DIR, "flush.lock")
+    inserted = 0
+    with open(lock_path, "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        _claim()
+        for path in _pending_files():
+            with open(path, encoding="utf-8") as claimed:
+                # Ждет писателей, открывших файл до переименования.
+                fcntl.flock(claimed, fcntl.LOCK_EX)
+                records = list(_read(path))
+            for start in range(0, len(records), batch_size):
+                inserted += _insert(records[start:start + batch_size])
+            os.remove(path)
+    return inserted
+
+
+def _flush_forever():
+    while True:
+        time.sleep(settings.COMMENT_FLUSH_INTERVAL)
+        try:
+            flush()
+        except Exception:
+            logger.exception("Не удалось перенести комментарии")
+        finally:
+            connection.close()
+
+
+def start_flusher():
+    """Запускает фоновый сборщик процесса, если он включен."""
+    global _flusher
+    if settings.COMMENT_FLUSH_INTERVAL is None:
+        return
+    with _flusher_lock:
+        if _flusher is None or not _flusher.is_alive():
+            _flusher = threading.Thread(target=_flush_forever,
+                                        name="comment-flusher", daemon=True)
+            _flusher.start()
+
+
+def remember(request, record):
+    """Запоминает комментарий в сессии автора до переноса в базу."""
+    request.session[SESSION_KEY] = (
+        request.session.get(SESSION_KEY, []) + [record])
+
+
+def pending(request, post_id):
+    """Еще не перенесенные комментарии автора к посту, новые первыми.
+
+    Перенесенные убираются из сессии; запрос к базе — только если в
+    сессии что-то есть. Записи к другим постам старше
+    COMMENT_PENDING_MAX_AGE секунд тоже убираются: к этому времени они
+    уже в базе, а иначе сессия копила бы их, пока автор не откроет
+    каждый пост.
+    """
+    if not request.user.is_authenticated:
+        return []
+    records = request.session.get(SESSION_KEY)
+    if not records:
+        return []
+    deadline = timezone.now() - timedelta(
+        seconds=settings.COMMENT_PENDING_MAX_AGE)
+    kept = [record for record in records
+            if record["post"] == post_id
+            or parse_datetime(record["created"]) > deadline]
+    mine = [record for record in kept if record["post"] == post_id]
+    waiting = mine
+    if mine:
+        flushed = set(Comment.objects.filter(
+            post_id=post_id, author=request.user,
+            created__in=[parse_datetime(record["created"])
+                         for record in mine],
+        ).values_list("created", flat=True))
+        waiting = [record for record in mine
+                   if parse_datetime(record["created"]) not in flushed]
+        kept = [record for record in kept
+                if record["post"] != post_id or record in waiting]
+    if len(kept) != len(records):
+        request.session[SESSION_KEY] = kept
+    return [
+        Comment(post_id=post_id, author=request.user, text=record["text"],
+                created=parse_datetime(record["created"]))
+        for record in reversed(waiting)
+    ]
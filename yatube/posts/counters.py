@@ -0,0 +1,107 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import (AuthorStats, Comment, Follow, Group, Post, StoredImage,
+                     User)
+
+
+def bump(queryset, field, delta):
+    """Атомарно сдвигает счетчик, не опуская его ниже нуля."""
+    if delta < 0:
+        queryset = queryset.filter(**{f"{field}__gte": -delta})
+    return queryset.update(**{field: F(field) + delta})
+
+
+def bump_author(user_id, field, delta):
+    stats = AuthorStats.objects.filter(user_id=user_id)
+    # Строки может не быть у пользователей, созданных через bulk_create.
+    if not bump(stats, field, delta) and delta > 0 and not stats.exists():
+        recount_authors(User.objects.filter(pk=user_id))
+
+
+def bump_group(group_id, delta):
+    if group_id is not None:
+        bump(Group.objects.filter(pk=group_id), "posts_count", delta)
+
+
+def bump_post_comments(post_id, delta):
+    bump(Post.objects.filter(pk=post_id), "comments_count", delta)
+
+
+def retain_image(name):
+    """Еще один пост ссылается на файл."""
+    if not name:
+        return
+    images = StoredImage.objects.filter(name=name)
+    if images.update(refs=F("refs") + 1, released=None):
+        return
+    try:
+        with transaction.atomic():
+            StoredImage.objects.create(name=name, refs=1)
+    except IntegrityError:
+        images.update(refs=F("refs") + 1, released=None)
+
+
+def release_image(name):
+    """Пост больше не ссылается на файл; без ссылок файл ждет сборки."""
+    if not name:
+        return
+    images = StoredImage.objects.filter(name=name)
+    bump(images, "refs", -1)
+    images.filter(refs=0, released__isnull=True).update(
+        released=timezone.now())
+
+
+def recount_images():
+    """Пересчитывает ссылки на файлы по Post.image."""
+    refs = dict(Post.objects.exclude(image="").order_by().values(
+        "image").annotate(total=Count("pk")).values_list("image", "total"))
+    StoredImage.objects.bulk_create(
+        [StoredImage(name=name) for name in refs], ignore_conflicts=True)
+    updated = 0
+    for image in StoredImage.objects.all():
+        total = refs.get(image.name, 0)
+        if image.refs != total:
+            image.refs = total
+            image.released = None if total else (
+                image.released or timezone.now())
+            image.save(update_fields=["refs", "released"])
+            updated += 1
+    return updated
+
+
+def _count(queryset, field):
+    return Coalesce(Subquery(
+        queryset.filter(**{field: OuterRef("pk")})
+        .order_by().values(field).annotate(total=Count("pk"))
+        .values("total")
+    ), 0)
+
+
+def recount_authors(users=None):
+    users = User.objects.all() if users is None else users
+    user_ids = users.values_list("pk", flat=True)
+    AuthorStats.objects.bulk_create(
+        [AuthorStats(user_id=user_id) for user_id in user_ids.exclude(
+            stats__isnull=False)],
+        ignore_conflicts=True,
+    )
+    return AuthorStats.objects.filter(user_id__in=user_ids).update(
+        posts_count=_count(Post.objects.all(), "author"),
+        followers_count=_count(Follow.objects.all(), "author"),
+        following_count=_count(Follow.objects.all(), "user"),
+    )
+
+
+def recount():
+    """Пересчитывает все счетчики по исходным таблицам."""
+    return {
+        "authors": recount_authors(),
+        "groups": Group.objects.update(
+            posts_count=_count(Post.objects.all(), "group")),
+        "posts": Post.objects.update(
+            comments_count=_count(Comment.objects.all(), "post")),
+        "images": recount_images(),
+    }
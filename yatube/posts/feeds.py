@@ -0,0 +1,182 @@
+"""RSS и Atom для групп и авторов.
+
+Документ пишется по мере чтения постов из базы и уходит клиенту
+StreamingHttpResponse. Готовые байты кэшируются под меткой изменений
+группы или автора, поэтому повторные опросы читалок не трогают базу,
+пока в области ничего не поменялось (если метки общие для воркеров,
+см. caching.markers_shared).
+"""
+import hashlib
+import io
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.feedgenerator import Atom1Feed, Rss201rev2Feed
+from django.utils.text import Truncator
+from django.utils.xmlutils import SimplerXMLGenerator
+
+from .caching import (changed_at, conditional_page, markers_shared,
+                      scope)
+from .models import Group, User
+
+FEED_PREFIX = "posts:feed"
+
+
+class StreamingFeedMixin:
+    """Пишет ленту кусками: заголовок, по записи на пост, хвост."""
+
+    def __init__(self, *args, updated, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.updated = updated
+
+    def latest_post_date(self):
+        # Записи еще не прочитаны; дата изменения известна по метке.
+        return self.updated
+
+    def stream(self, items, encoding="utf-8"):
+        buffer = io.StringIO()
+        handler = SimplerXMLGenerator(buffer, encoding)
+
+        def drain():
+            chunk = buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            return chunk.encode(encoding)
+
+        handler.startDocument()
+        self.open_elements(handler)
+        yield drain()
+        for item in items:
+            self.add_item(**item)
+            self.write_item(handler, self.items.pop())
+            yield drain()
+        self.close_elements(handler)
+        yield drain()
+
+
+class StreamingRssFeed(StreamingFeedMixin, Rss201rev2Feed):
+    def open_elements(self, handler):
+        handler.startElement("rss", self.rss_attributes())
+        handler.startElement("channel", self.root_attributes())
+        self.add_root_elements(handler)
+
+    def write_item(self, handler, item):
+        handler.startElement("item", self.item_attributes(item))
+        self.add_item_elements(handler, item)
+        handler.endElement("item")
+
+    def close_elements(self, handler):
+        self.endChannelElement(handler)
+        handler.endElement("rss")
+
+
+class StreamingAtomFeed(StreamingFeedMixin, Atom1Feed):
+    def open_elements(self, handler):
+        handler.startElement("feed", self.root_attributes())
+        self.add_root_elements(handler)
+
+    def write_item(self, handler, item):
+        handler.startElement("entry", self.item_attributes(item))
+        self.add_item_elements(handler, item)
+        handler.endElement("entry")
+
+    def close_elements(self, handler):
+        handler.endElement("feed")
+
+
+FEED_TYPES = {"rss": StreamingRssFeed, "atom": StreamingAtomFeed}
+
+
+def post_items(request, posts):
+    for post in posts.select_related("author")[:settings.FEED_ITEMS]:
+        link = request.build_absolute_uri(
+            reverse("posts:post_detail", kwargs={"post_id": post.pk}))
+        yield {
+            "title": Truncator(post.text).words(8),
+            "link": link,
+            "description": post.text,
+            "unique_id": link,
+            "pubdate": post.pub_date,
+            "updateddate": post.edited,
+            "author_name": post.author.get_full_name()
+            or post.author.username,
+        }
+
+
+def feed_response(request, feed_format, scopes, build):
+    """Отдает ленту из кэша или строит ее потоком и кладет в кэш.
+
+    build(updated) возвращает (feed, items) уже найденного объекта.
+    """
+    content_type = FEED_TYPES[feed_format].content_type
+    if not markers_shared():
+        feed, items = build(datetime.now(tz=timezone.utc))
+        return StreamingHttpResponse(feed.stream(items),
+                                     content_type=content_type)
+    changed = changed_at(*scopes)
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    key = f"{FEED_PREFIX}:{path}:{changed:.6f}"
+    cached = cache.get(key)
+    if cached is not None:
+        return HttpResponse(cached, content_type=content_type)
+    feed, items = build(datetime.fromtimestamp(changed, tz=timezone.utc))
+
+    def chunks():
+        parts = []
+        for chunk in feed.stream(items):
+            parts.append(chunk)
+            yield chunk
+        cache.set(key, b"".join(parts), settings.PAGE_CACHE_TIMEOUT)
+
+    return StreamingHttpResponse(chunks(), content_type=content_type)
+
+
+def feed_scopes(name, kwarg):
+    return lambda request, feed_format, **kwargs: [
+        scope(name, kwargs[kwarg])]
+
+
+@conditional_page(feed_scopes("group", "slug"))
+def group_feed(request, slug, feed_format):
+    def build(updated):
+        group = get_object_or_404(Group, slug=slug)
+        link = request.build_absolute_uri(
+            reverse("posts:group_list", kwargs={"slug": slug}))
+        feed = FEED_TYPES[feed_format](
+            title=group.title,
+            link=link,
+            description=group.description,
+            feed_url=request.build_absolute_uri(),
+            language=settings.LANGUAGE_CODE,
+            updated=updated,
+        )
+        return feed, post_items(request, group.posts.all())
+
+    return feed_response(request, feed_format, [scope("group", slug)],
+                         build)
+
+
+@conditional_page(feed_scopes("author", "username"))
+def author_feed(request, username, feed_format):
+    def build(updated):
+        author = get_object_or_404(User, username=username)
+        name = author.get_full_name() or author.username
+        link = request.build_absolute_uri(
+            reverse("posts:profile", kwargs={"username": username}))
+        feed = FEED_TYPES[feed_format](
+            title=f"Записи {name}",
+            link=link,
+            description=f"Последние записи пользователя {name}",
+            feed_url=request.build_absolute_uri(),
+            language=settings.LANGUAGE_CODE,
+            author_name=name,
+            updated=updated,
+        )
+        return feed, post_items(request, author.posts.all())
+
+    return feed_response(request, feed_format,
+                         [scope("author", username)], build)
@@ -1,5 +1,7 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 
+from . import images
 from .models import Post, Comment
 
 
@@ -7,6 +9,14 @@ class PostForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.fields['group'].empty_label = "Группа не выбрана"
+
+    def clean_image(self):
+        image = self.cleaned_data.get("image")
+        # Уже сохраненная картинка (FieldFile) повторно не обрабатывается.
+        if isinstance(image, UploadedFile):
+            return images.ingest(image)
+        return image
+
     class Meta:
         model = Post
         fields = ("group", "text", "image")
@@ -0,0 +1,93 @@
+"""Обработка загруженных картинок постов.
+
+Оригинал не сохраняется как есть: картинка поворачивается по EXIF,
+уменьшается до POST_IMAGE_MAX_SIZE и перекодируется (JPEG, PNG для
+картинок с прозрачностью) без EXIF и прочих метаданных, кроме
+цветового профиля. Так хранилище не растет от 20-мегабайтных снимков,
+а sorl при генерации миниатюр декодирует уже небольшой файл.
+
+Загрузки больше FILE_UPLOAD_MAX_MEMORY_SIZE Django пишет во временный
+файл, а Pillow читает его по мере декодирования; JPEG к тому же
+декодируется сразу в уменьшенном масштабе (Image.draft).
+"""
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image, ImageOps
+
+try:
+    from PIL import ImageCms
+except ImportError:
+    ImageCms = None
+
+EXTENSIONS = {"JPEG": ".jpg", "PNG": ".png"}
+KEPT_INFO = ("icc_profile", "transparency")
+
+
+def has_alpha(image):
+    return image.mode in ("RGBA", "LA") or (
+        image.mode == "P" and "transparency" in image.info)
+
+
+def to_rgb(image):
+    """RGB-копия картинки.
+
+    Профиль описывает исходный режим (например, CMYK) и к RGB не
+    подходит: цвета переводятся им в sRGB, а сам профиль отбрасывается.
+    Без ImageCms или с битым профилем остается простой convert().
+    """
+    icc_profile = image.info.get("icc_profile")
+    converted = None
+    if icc_profile and ImageCms is not None:
+        try:
+            converted = ImageCms.profileToProfile(
+                image, ImageCms.ImageCmsProfile(BytesIO(icc_profile)),
+                ImageCms.createProfile("sRGB"), outputMode="RGB")
+        except (ImageCms.PyCMSError, OSError):
+            converted = None
+    if converted is None:
+        converted = image.convert("RGB")
+    converted.info.pop("icc_profile", None)
+    return converted
+
+
+def ingest(upload):
+    """Уменьшенная и перекодированная копия загруженной картинки."""
+    upload.seek(0)
+    try:
+        image = Image.open(upload)
+        width, height = image.size
+        if width * height > settings.POST_IMAGE_MAX_PIXELS:
+            raise ValidationError(
+                f"Слишком большое изображение: {width}x{height}. Не больше "
+                f"{settings.POST_IMAGE_MAX_PIXELS // 10 ** 6} Мпикс.",
+                code="too_large",
+            )
+        max_size = settings.POST_IMAGE_MAX_SIZE
+        # Поворот по EXIF может поменять стороны местами.
+        side = max(max_size)
+        image.draft(None, (side, side))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail(max_size, Image.LANCZOS)
+    except (OSError, SyntaxError, ValueError) as error:
+        raise ValidationError(f"Не удалось обработать изображение: {error}",
+                              code="invalid_image")
+    format_ = "PNG" if has_alpha(image) else "JPEG"
+    if format_ == "JPEG" and image.mode != "RGB":
+        image = to_rgb(image)
+    image.info = {key: image.info[key] for key in KEPT_INFO
+                  if key in image.info}
+    options = {"optimize": True}
+    if "icc_profile" in image.info:
+        options["icc_profile"] = image.info["icc_profile"]
+    if format_ == "JPEG":
+        options.update(quality=settings.POST_IMAGE_QUALITY,
+                       progressive=True)
+    output = BytesIO()
+    image.save(output, format_, **options)
+    name = os.path.splitext(os.path.basename(upload.name))[0]
+    return SimpleUploadedFile(name + EXTENSIONS[format_], output.getvalue(),
+                              content_type=Image.MIME[format_])
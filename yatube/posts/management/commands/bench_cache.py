@@ -0,0 +1,79 @@
+import multiprocessing
+import random
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import override_settings
+
+from posts import benchmarks, counters
+from posts.management.commands.warm_cache import warm_urls
+
+
+def _worker(args):
+    backend, urls, requests, seed = args
+    connections.close_all()
+    rnd = random.Random(seed)
+    with override_settings(CACHES={"default": backend}):
+        client = benchmarks.visitor_client()
+        samples = []
+        for _ in range(requests):
+            url = rnd.choice(urls)
+            started = time.perf_counter()
+            client.get(url)
+            samples.append(time.perf_counter() - started)
+    return samples
+
+
+class Command(BaseCommand):
+    help = ("Сравнивает бэкенды кэша под нагрузкой из нескольких "
+            "процессов, как у воркеров gunicorn.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--backends", nargs="+",
+                            default=["locmem", "file", "sqlite"],
+                            choices=sorted(settings.CACHE_BACKENDS))
+        parser.add_argument("--workers", type=int, default=4)
+        parser.add_argument("--requests", type=int, default=200,
+                            help="Запросов на один процесс.")
+        parser.add_argument("--posts", type=int, default=20000)
+        parser.add_argument("--users", type=int, default=500)
+        parser.add_argument("--groups", type=int, default=20)
+        parser.add_argument("--warm", action="store_true",
+                            help="Прогреть кэш перед замером.")
+
+    def handle(self, *args, **options):
+        with benchmarks.isolated_database(on_disk=True):
+            self.stdout.write("Заполняем базу...")
+            user_ids = benchmarks.seed_users(options["users"])
+            group_ids = benchmarks.seed_groups(options["groups"])
+            benchmarks.seed_posts(user_ids, options["posts"], group_ids)
+            counters.recount()
+            urls = warm_urls(settings.CACHE_WARM_PAGES,
+                             settings.CACHE_WARM_GROUPS)
+            for name in options["backends"]:
+                self._run(name, urls, options)
+
+    def _run(self, name, urls, options):
+        # Кэш во временном каталоге: LOCATION из настроек — живой кэш.
+        with benchmarks.isolated_cache(
+                settings.CACHE_BACKENDS[name]) as backend:
+            cache.clear()
+            if options["warm"]:
+                client = benchmarks.visitor_client()
+                for url in urls:
+                    client.get(url)
+            connections.close_all()
+            jobs = [(backend, urls, options["requests"], seed)
+                    for seed in range(options["workers"])]
+            started = time.perf_counter()
+            with multiprocessing.get_context("fork").Pool(
+                    options["workers"]) as pool:
+                results = pool.map(_worker, jobs)
+            elapsed = time.perf_counter() - started
+        samples = [sample for result in results for sample in result]
+        self.stdout.write(
+            f"[{name}] {len(samples) / elapsed:.1f} req/s  "
+            f"{benchmarks.format_ms(benchmarks.summary(samples))}")
@@ -0,0 +1,63 @@
+import random
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from posts import benchmarks
+from posts.models import Follow
+
+# Последняя миграция без уникальности и составного индекса Follow.
+BEFORE_MIGRATION = "0010_timelineentry"
+
+
+class Command(BaseCommand):
+    help = ("Замеряет поиск подписки (user, author) на временной базе "
+            "до и после миграции с составными индексами Follow.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=20000)
+        parser.add_argument("--follows-per-user", type=int, default=50)
+        parser.add_argument("--duplicates", type=int, default=1000,
+                            help="Сколько дублей подписок добавить до "
+                                 "миграции.")
+        parser.add_argument("--lookups", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        with benchmarks.isolated_database():
+            call_command("migrate", "posts", BEFORE_MIGRATION, verbosity=0)
+            self.stdout.write("Заполняем базу...")
+            user_ids = benchmarks.seed_users(options["users"])
+            pairs = benchmarks.seed_follows(user_ids,
+                                            options["follows_per_user"])
+            rnd = random.Random(1)
+            Follow.objects.bulk_create(
+                [Follow(user_id=user_id, author_id=author_id)
+                 for user_id, author_id in rnd.sample(
+                     pairs, min(options["duplicates"], len(pairs)))],
+                batch_size=benchmarks.BATCH_SIZE,
+            )
+            samples = [rnd.choice(pairs) for _ in range(options["lookups"])]
+            self._report("до", samples)
+
+            call_command("migrate", "posts", verbosity=0)
+            self.stdout.write(
+                f"Подписок после удаления дублей: {Follow.objects.count()} "
+                f"из {len(pairs) + options['duplicates']}")
+            self._report("после", samples)
+
+    def _report(self, label, samples):
+        lookups = iter(samples)
+
+        def is_following():
+            user_id, author_id = next(lookups)
+            Follow.objects.filter(author_id=author_id,
+                                  user_id=user_id).exists()
+
+        user_id, author_id = samples[0]
+        plan = Follow.objects.filter(author_id=author_id,
+                                     user_id=user_id).explain()
+        stats = benchmarks.summary(
+            benchmarks.timed(is_following, len(samples)))
+        self.stdout.write(f"[{label}] (user, author) exists: "
+                          f"{benchmarks.format_ms(stats)}")
+        self.stdout.write(f"[{label}] план: {plan}")
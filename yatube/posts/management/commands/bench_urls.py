@@ -0,0 +1,223 @@
+import json
+import os
+import platform
+import statistics
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from posts import benchmarks, counters, timeline
+from posts.models import Group, Post, User
+
+# Запросы на замер памяти и числа SQL: tracemalloc сильно замедляет
+# рендер, поэтому он включается только в отдельном коротком проходе.
+PROFILE_REQUESTS = 5
+# Базовые результаты в репозитории: их снимают с параметрами по умолчанию
+# (seed у генераторов данных фиксирован) и обновляют через --save вместе
+# с изменением, которое сдвигает цифры. Время зависит от машины, поэтому
+# сравнивать стоит прежде всего queries и peak_kib.
+BASELINE = os.path.join(settings.BASE_DIR, "benchmarks", "bench_urls.json")
+SEED_OPTIONS = ("users", "posts", "groups", "comments", "follows_per_user",
+                "requests", "faker", "cold", "on_disk", "page_cache")
+
+
+class Command(BaseCommand):
+    help = ("Заполняет временную базу и замеряет каждый URL приложения "
+            "posts: задержку, число SQL-запросов и пиковую память.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--posts", type=int, default=20000)
+        parser.add_argument("--groups", type=int, default=20)
+        parser.add_argument("--comments", type=int, default=20000)
+        parser.add_argument("--follows-per-user", type=int, default=20)
+        parser.add_argument("--requests", type=int, default=50,
+                            help="Запросов на один URL.")
+        parser.add_argument("--faker", action="store_true",
+                            help="Тексты из Faker вместо шаблонных.")
+        parser.add_argument("--cold", action="store_true",
+                            help="Очищать кэш перед каждым запросом.")
+        parser.add_argument("--page-cache", action="store_true",
+                            help="Не отключать кэш страниц гостей: без "
+                                 "него замеряются сами представления, с "
+                                 "ним — попадания в кэш.")
+        parser.add_argument("--on-disk", action="store_true",
+                            help="База во временном файле, а не в памяти.")
+        parser.add_argument("--save", metavar="PATH", nargs="?",
+                            const=BASELINE,
+                            help="Сохранить результаты как базовые "
+                                 "(по умолчанию в benchmarks/).")
+        parser.add_argument("--compare", metavar="PATH", nargs="?",
+                            const=BASELINE,
+                            help="Сравнить с сохраненными результатами "
+                                 "(по умолчанию из benchmarks/).")
+
+    def handle(self, *args, **options):
+        seed_options = {key: options[key] for key in SEED_OPTIONS}
+        baseline = None
+        if options["compare"]:
+            try:
+                with open(options["compare"], encoding="utf-8") as file:
+                    saved = json.load(file)
+                baseline = saved["results"]
+            except (OSError, ValueError, KeyError) as error:
+                raise CommandError(f"Не прочитать {options['compare']}: "
+                                   f"{error}")
+            if saved.get("options") != seed_options:
+                self.stderr.write(
+                    "Базовые результаты сняты с другими параметрами: "
+                    f"{saved.get('options')}")
+        # Прогрев кладет страницу гостя в кэш, и дальше замерялось бы
+        # только попадание в него, а не ORM и шаблоны представления.
+        page_cache = ({} if options["page_cache"]
+                      else {"PAGE_CACHE_TIMEOUT": 0})
+        with benchmarks.isolated_database(on_disk=options["on_disk"]), \
+                benchmarks.isolated_cache(), override_settings(**page_cache):
+            self.stdout.write("Заполняем базу...")
+            started = time.perf_counter()
+            self._seed(options)
+            self.stdout.write(
+                f"Заполнено за {time.perf_counter() - started:.1f}s")
+            results = {
+                name: self._measure(request, options)
+                for name, request in self._scenarios().items()
+            }
+        for name, result in results.items():
+            self.stdout.write(self._format(name, result,
+                                           (baseline or {}).get(name)))
+        if options["save"]:
+            saved = {
+                "options": seed_options,
+                "python": platform.python_version(),
+                "results": results,
+            }
+            with open(options["save"], "w", encoding="utf-8") as file:
+                json.dump(saved, file, indent=2, sort_keys=True)
+                file.write("\n")
+            self.stdout.write(f"Результаты сохранены в {options['save']}")
+
+    def _seed(self, options):
+        fake = benchmarks.faker() if options["faker"] else None
+        user_ids = benchmarks.seed_users(options["users"])
+        group_ids = benchmarks.seed_groups(options["groups"])
+        benchmarks.seed_follows(user_ids, options["follows_per_user"])
+        benchmarks.seed_posts(user_ids, options["posts"], group_ids,
+                              fake=fake)
+        post_ids = list(Post.objects.values_list("id", flat=True))
+        benchmarks.seed_comments(post_ids, user_ids, options["comments"],
+                                 fake=fake)
+        # bulk_create не шлет сигналов: счетчики и ленты строим сами.
+        counters.recount()
+        timeline.rebuild()
+
+    def _scenarios(self):
+        """Запросы по всем URL posts/urls.py на самых тяжелых объектах."""
+        author = User.objects.order_by("-stats__posts_count").first()
+        reader = User.objects.order_by("-stats__following_count").first()
+        group = Group.objects.order_by("-posts_count").first()
+        post = Post.objects.filter(author=author).order_by(
+            "-comments_count").first()
+        hot = Post.objects.annotate(total=Count("comment")).order_by(
+            "-total").first()
+        # Последняя страница, доступная по номеру.
+        pages = max(1, min(Post.objects.count() // 10,
+                           settings.PAGINATOR_MAX_PAGES))
+        word = Post.objects.values_list("text", flat=True).first().split()[0]
+        guest = benchmarks.visitor_client()
+        author_client = benchmarks.visitor_client()
+        author_client.force_login(author)
+        reader_client = benchmarks.visitor_client()
+        reader_client.force_login(reader)
+        following = {"value": False}
+
+        def follow_toggle():
+            # Подписка и отписка по очереди, чтобы не копить состояние.
+            name = "unfollow" if following["value"] else "follow"
+            following["value"] = not following["value"]
+            return reader_client.get(reverse(f"posts:profile_{name}", kwargs={
+                "username": author.username}))
+
+        return {
+            "index": lambda: guest.get(reverse("posts:index")),
+            "index_last_page": lambda: guest.get(
+                reverse("posts:index") + f"?page={pages}"),
+            "group_list": lambda: guest.get(reverse(
+                "posts:group_list", kwargs={"slug": group.slug})),
+            "profile": lambda: guest.get(reverse(
+                "posts:profile", kwargs={"username": author.username})),
+            "post_detail": lambda: guest.get(reverse(
+                "posts:post_detail", kwargs={"post_id": hot.pk})),
+            "search": lambda: guest.get(
+                reverse("posts:search") + f"?q={word}"),
+            "follow_index": lambda: reader_client.get(
+                reverse("posts:follow_index")),
+            "post_create": lambda: author_client.get(
+                reverse("posts:post_create")),
+            "post_edit": lambda: author_client.get(reverse(
+                "posts:post_edit", kwargs={"post_id": post.pk})),
+            "add_comment": lambda: reader_client.post(
+                reverse("posts:add_comment", kwargs={"post_id": post.pk}),
+                {"text": "bench"}),
+            "profile_follow_unfollow": follow_toggle,
+        }
+
+    def _measure(self, request, options):
+        def run():
+            if options["cold"]:
+                cache.clear()
+            response = request()
+            if response.status_code >= 400:
+                raise CommandError(
+                    f"{response.request['PATH_INFO']}: "
+                    f"{response.status_code}")
+
+        run()
+        started = time.perf_counter()
+        samples = benchmarks.timed(run, options["requests"])
+        elapsed = time.perf_counter() - started
+        queries = []
+        peaks = []
+        tracemalloc.start()
+        try:
+            for _ in range(PROFILE_REQUESTS):
+                tracemalloc.reset_peak()
+                with CaptureQueriesContext(connection) as context:
+                    run()
+                queries.append(len(context.captured_queries))
+                peaks.append(tracemalloc.get_traced_memory()[1])
+        finally:
+            tracemalloc.stop()
+        result = benchmarks.summary(samples)
+        result.update({
+            "rps": len(samples) / elapsed,
+            "queries": statistics.median(queries),
+            "peak_kib": max(peaks) / 1024,
+        })
+        return result
+
+    def _format(self, name, result, baseline):
+        latency = {key: result[key] for key in ("p50", "p95", "p99")}
+        line = (f"{name:<24} {benchmarks.format_ms(latency)}  "
+                f"{result['rps']:.1f} req/s  "
+                f"queries={result['queries']:g}  "
+                f"peak={result['peak_kib']:.0f}KiB")
+        if baseline:
+            line += "  | " + "  ".join(
+                f"{key} {_delta(result[key], baseline[key])}"
+                for key in ("p95", "queries", "peak_kib") if key in baseline
+            )
+        return line
+
+
+def _delta(value, base):
+    # От нуля процент не посчитать, а рост с нуля и есть регрессия.
+    if not base:
+        return f"{value - base:+g}"
+    return f"{(value - base) / base * 100:+.0f}%"
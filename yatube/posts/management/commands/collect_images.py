@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import storage
+
+
+class Command(BaseCommand):
+    help = ("Удаляет картинки постов, на которые больше не ссылается ни "
+            "один пост, вместе с их миниатюрами.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--grace", type=int, default=settings.IMAGE_COLLECT_GRACE,
+            help="Сколько секунд файл должен пробыть без ссылок.")
+
+    def handle(self, *args, **options):
+        removed = storage.collect(options["grace"])
+        self.stdout.write(self.style.SUCCESS(f"Удалено файлов: {removed}"))
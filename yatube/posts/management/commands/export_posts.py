@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = ("Выгружает посты, комментарии или подписки в JSONL или CSV "
+            "потоком, пачками по --batch-size записей.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Файл или - для stdout.")
+        parser.add_argument("--kind", choices=sorted(transfer.KINDS),
+                            default="posts")
+        parser.add_argument("--format", choices=transfer.FORMATS,
+                            help="По умолчанию по расширению файла.")
+        parser.add_argument("--batch-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        format_ = options["format"] or (
+            "csv" if path.endswith(".csv") else "jsonl")
+        rows = transfer.export_rows(options["kind"], options["batch_size"])
+        if path == "-":
+            self.stdout.ending = ""
+            count = transfer.write_rows(rows, options["kind"], format_,
+                                        self.stdout)
+            self.stderr.write(f"Выгружено записей: {count}")
+            return
+        with open(path, "w", encoding="utf-8", newline="") as stream:
+            count = transfer.write_rows(rows, options["kind"], format_,
+                                        stream)
+        self.stdout.write(self.style.SUCCESS(f"Выгружено записей: {count}"))
@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import comment_queue
+
+
+class Command(BaseCommand):
+    help = ("Переносит комментарии из журнала буферизованной записи "
+            "в базу (см. COMMENT_QUEUE).")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int,
+                            default=settings.COMMENT_FLUSH_BATCH)
+
+    def handle(self, *args, **options):
+        inserted = comment_queue.flush(options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Перенесено комментариев: {inserted}"))
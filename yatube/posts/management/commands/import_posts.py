@@ -0,0 +1,50 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = ("Загружает посты, комментарии или подписки из JSONL или CSV "
+            "пачками через bulk_create, без сигналов на каждую запись.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Файл или - для stdin.")
+        parser.add_argument("--kind", choices=sorted(transfer.KINDS),
+                            default="posts")
+        parser.add_argument("--format", choices=transfer.FORMATS,
+                            help="По умолчанию по расширению файла.")
+        parser.add_argument("--batch-size", type=int, default=2000)
+        parser.add_argument("--no-rebuild", action="store_true",
+                            help="Не пересчитывать счетчики и ленты; "
+                                 "удобно при загрузке нескольких файлов.")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        format_ = options["format"] or (
+            "csv" if path.endswith(".csv") else "jsonl")
+        if path == "-":
+            count = self._import(sys.stdin, format_, options)
+        else:
+            with open(path, encoding="utf-8", newline="") as stream:
+                count = self._import(stream, format_, options)
+        self.stdout.write(f"Загружено записей: {count}")
+        if self.skipped:
+            self.stderr.write(f"Пропущено записей: {self.skipped}")
+        if options["no_rebuild"]:
+            self.stdout.write("Счетчики и ленты не пересчитаны: выполните "
+                              "recount и rebuild_timeline.")
+            return
+        transfer.rebuild()
+        self.stdout.write(self.style.SUCCESS("Счетчики и ленты пересчитаны"))
+
+    def _import(self, stream, format_, options):
+        self.skipped = 0
+        return transfer.import_rows(
+            options["kind"], transfer.read_rows(format_, stream),
+            options["batch_size"], on_skip=self._skip)
+
+    def _skip(self, number, error):
+        self.skipped += 1
+        self.stderr.write(f"Запись {number} пропущена: {error}")
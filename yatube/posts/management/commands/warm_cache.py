@@ -0,0 +1,39 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.urls import reverse
+
+from posts.models import Group
+
+
+def warm_urls(pages, groups):
+    """Первые страницы главной и самых крупных групп."""
+    urls = [reverse("posts:index")]
+    for slug in Group.objects.order_by("-posts_count").values_list(
+            "slug", flat=True)[:groups]:
+        urls.append(reverse("posts:group_list", kwargs={"slug": slug}))
+    return [f"{url}?page={page}" for url in urls
+            for page in range(1, pages + 1)]
+
+
+class Command(BaseCommand):
+    help = ("Заранее рендерит первые страницы главной и крупных групп, "
+            "чтобы заполнить общий кэш до прихода пользователей.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--pages", type=int,
+                            default=settings.CACHE_WARM_PAGES)
+        parser.add_argument("--groups", type=int,
+                            default=settings.CACHE_WARM_GROUPS)
+
+    def handle(self, *args, **options):
+        host = settings.ALLOWED_HOSTS[0] if settings.ALLOWED_HOSTS else None
+        client = Client(HTTP_HOST=host) if host else Client()
+        warmed = 0
+        for url in warm_urls(options["pages"], options["groups"]):
+            response = client.get(url)
+            if response.status_code == 200:
+                warmed += 1
+            else:
+                self.stderr.write(f"{url}: {response.status_code}")
+        self.stdout.write(self.style.SUCCESS(f"Прогрето страниц: {warmed}"))
@@ -0,0 +1,22 @@
+# Generated by Django 2.2.16 on 2026-10-18 03:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("posts", "0008_auto_20230202_1954"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(fields=["author", "-pub_date"],
+                               name="post_author_pub_date_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(fields=["group", "-pub_date"],
+                               name="post_group_pub_date_idx"),
+        ),
+    ]
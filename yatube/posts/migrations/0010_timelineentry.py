@@ -0,0 +1,76 @@
+# Generated by Django 2.2.16 on 2026-10-18 03:59
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_timeline(apps, schema_editor):
+    Follow = apps.get_model("posts", "Follow")
+    Post = apps.get_model("posts", "Post")
+    TimelineEntry = apps.get_model("posts", "TimelineEntry")
+    for user_id, author_id in Follow.objects.values_list(
+            "user_id", "author_id").distinct().iterator():
+        posts = Post.objects.filter(author_id=author_id).values_list(
+            "id", "pub_date")
+        TimelineEntry.objects.bulk_create(
+            [TimelineEntry(user_id=user_id, post_id=post_id,
+                           author_id=author_id, pub_date=pub_date)
+             for post_id, pub_date in posts.iterator()],
+            batch_size=1000,
+            ignore_conflicts=True,
+        )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("posts", "0009_post_feed_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TimelineEntry",
+            fields=[
+                ("id", models.AutoField(auto_created=True, primary_key=True,
+                                        serialize=False, verbose_name="ID")),
+                ("pub_date",
+                 models.DateTimeField(verbose_name="Дата публикации")),
+                ("author",
+                 models.ForeignKey(on_delete=django.db.models.deletion.CASCADE,
+                                   related_name="+",
+                                   to=settings.AUTH_USER_MODEL,
+                                   verbose_name="Автор")),
+                ("post",
+                 models.ForeignKey(on_delete=django.db.models.deletion.CASCADE,
+                                   related_name="timeline_entries",
+                                   to="posts.Post", verbose_name="Пост")),
+                ("user",
+                 models.ForeignKey(on_delete=django.db.models.deletion.CASCADE,
+                                   related_name="timeline",
+                                   to=settings.AUTH_USER_MODEL,
+                                   verbose_name="Подписчик")),
+            ],
+            options={
+                "verbose_name": "Запись ленты",
+                "verbose_name_plural": "Записи ленты",
+                "ordering": ["-pub_date", "-post_id"],
+            },
+        ),
+        migrations.AddIndex(
+            model_name="timelineentry",
+            index=models.Index(fields=["user", "-pub_date", "-post"],
+                               name="timeline_user_pub_date_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="timelineentry",
+            index=models.Index(fields=["user", "author"],
+                               name="timeline_user_author_idx"),
+        ),
+        migrations.AddConstraint(
+            model_name="timelineentry",
+            constraint=models.UniqueConstraint(fields=("user", "post"),
+                                               name="unique_timeline_entry"),
+        ),
+        migrations.RunPython(fill_timeline, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:00
+
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def remove_duplicate_follows(apps, schema_editor):
+    Follow = apps.get_model("posts", "Follow")
+    duplicates = (
+        Follow.objects.values("user_id", "author_id")
+        .annotate(keep_id=Min("id"), total=models.Count("id"))
+        .filter(total__gt=1)
+    )
+    for row in duplicates.iterator():
+        Follow.objects.filter(
+            user_id=row["user_id"], author_id=row["author_id"]
+        ).exclude(id=row["keep_id"]).delete()
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("posts", "0010_timelineentry"),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_follows,
+                             migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="follow",
+            constraint=models.UniqueConstraint(fields=("user", "author"),
+                                               name="unique_follow"),
+        ),
+        migrations.AddIndex(
+            model_name="follow",
+            index=models.Index(fields=["author", "user"],
+                               name="follow_author_user_idx"),
+        ),
+    ]
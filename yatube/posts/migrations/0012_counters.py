@@ -0,0 +1,85 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:02
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+
+def _count(queryset, field):
+    return Coalesce(Subquery(
+        queryset.filter(**{field: OuterRef("pk")})
+        .order_by().values(field).annotate(total=Count("pk"))
+        .values("total")
+    ), 0)
+
+
+def fill_counters(apps, schema_editor):
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    AuthorStats = apps.get_model("posts", "AuthorStats")
+    Comment = apps.get_model("posts", "Comment")
+    Follow = apps.get_model("posts", "Follow")
+    Group = apps.get_model("posts", "Group")
+    Post = apps.get_model("posts", "Post")
+    AuthorStats.objects.bulk_create(
+        [AuthorStats(user_id=user_id)
+         for user_id in User.objects.values_list("pk", flat=True)],
+        batch_size=500,
+    )
+    AuthorStats.objects.update(
+        posts_count=_count(Post.objects.all(), "author"),
+        followers_count=_count(Follow.objects.all(), "author"),
+        following_count=_count(Follow.objects.all(), "user"),
+    )
+    Group.objects.update(posts_count=_count(Post.objects.all(), "group"))
+    Post.objects.update(
+        comments_count=_count(Comment.objects.all(), "post"))
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("posts", "0011_follow_unique"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AuthorStats",
+            fields=[
+                ("user",
+                 models.OneToOneField(
+                     on_delete=django.db.models.deletion.CASCADE,
+                     primary_key=True, related_name="stats",
+                     serialize=False, to=settings.AUTH_USER_MODEL,
+                     verbose_name="Пользователь")),
+                ("posts_count",
+                 models.PositiveIntegerField(default=0,
+                                             verbose_name="Число постов")),
+                ("followers_count",
+                 models.PositiveIntegerField(
+                     default=0, verbose_name="Число подписчиков")),
+                ("following_count",
+                 models.PositiveIntegerField(default=0,
+                                             verbose_name="Число подписок")),
+            ],
+            options={
+                "verbose_name": "Счетчики автора",
+                "verbose_name_plural": "Счетчики авторов",
+            },
+        ),
+        migrations.AddField(
+            model_name="group",
+            name="posts_count",
+            field=models.PositiveIntegerField(default=0, editable=False,
+                                              verbose_name="Число постов"),
+        ),
+        migrations.AddField(
+            model_name="post",
+            name="comments_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False,
+                verbose_name="Число комментариев"),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:05
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def copy_pub_date(apps, schema_editor):
+    Post = apps.get_model("posts", "Post")
+    Post.objects.update(edited=F("pub_date"))
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("posts", "0012_counters"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="post",
+            name="edited",
+            field=models.DateTimeField(auto_now=True,
+                                       verbose_name="Дата изменения"),
+        ),
+        migrations.RunPython(copy_pub_date, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:20
+
+from django.db import migrations
+
+# Снимок схемы из posts.search на момент миграции: сам модуль
+# импортирует текущие модели и может меняться.
+FTS_TABLE = "posts_post_fts"
+CREATE_TABLE = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    f"text, content='posts_post', content_rowid='id', "
+    f"tokenize='unicode61 remove_diacritics 2')"
+)
+TRIGGERS = {
+    f"{FTS_TABLE}_ai": (
+        f"AFTER INSERT ON posts_post BEGIN "
+        f"INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text); "
+        f"END"
+    ),
+    f"{FTS_TABLE}_ad": (
+        f"AFTER DELETE ON posts_post BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text) "
+        f"VALUES ('delete', old.id, old.text); "
+        f"END"
+    ),
+    f"{FTS_TABLE}_au": (
+        f"AFTER UPDATE OF text ON posts_post BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text) "
+        f"VALUES ('delete', old.id, old.text); "
+        f"INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text); "
+        f"END"
+    ),
+}
+
+
+def install_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    schema_editor.execute(CREATE_TABLE)
+    for name, body in TRIGGERS.items():
+        schema_editor.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+    schema_editor.execute(
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def remove_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for name in TRIGGERS:
+        schema_editor.execute(f"DROP TRIGGER IF EXISTS {name}")
+    schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("posts", "0013_post_edited"),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search_index, remove_search_index),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 2.2.16 on 2026-10-18 10:05
+
+from django.db import migrations, models
+from django.db.models import Count
+import posts.storage
+
+
+def fill_refs(apps, schema_editor):
+    Post = apps.get_model("posts", "Post")
+    StoredImage = apps.get_model("posts", "StoredImage")
+    refs = (Post.objects.exclude(image="").order_by().values("image")
+            .annotate(total=Count("pk")).values_list("image", "total"))
+    StoredImage.objects.bulk_create(
+        [StoredImage(name=name, refs=total) for name, total in refs],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("posts", "0015_comment_post_created_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StoredImage",
+            fields=[
+                ("id",
+                 models.AutoField(auto_created=True, primary_key=True,
+                                  serialize=False, verbose_name="ID")),
+                ("name",
+                 models.CharField(max_length=255, unique=True,
+                                  verbose_name="Файл")),
+                ("refs",
+                 models.PositiveIntegerField(default=0,
+                                             verbose_name="Число ссылок")),
+                ("released",
+                 models.DateTimeField(blank=True, db_index=True, null=True,
+                                      verbose_name="Без ссылок с")),
+            ],
+            options={
+                "verbose_name": "Файл картинки",
+                "verbose_name_plural": "Файлы картинок",
+            },
+        ),
+        migrations.AlterField(
+            model_name="post",
+            name="image",
+            field=models.ImageField(
+                blank=True, storage=posts.storage.ContentAddressedStorage(),
+                upload_to="posts/", verbose_name="Добоавьте картинку"),
+        ),
+        migrations.RunPython(fill_refs, migrations.RunPython.noop),
+    ]
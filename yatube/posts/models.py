@@ -1,6 +1,8 @@
 from django.contrib.auth import get_user_model
 from django.db import models
 
+from .storage import content_storage
+
 User = get_user_model()
 CHARS_TO_OUTPUT = 15
 
@@ -11,6 +13,8 @@ class Group(models.Model):
     slug = models.SlugField("Адрес", unique=True)
     description = models.TextField("Описание",
                                    help_text="Введите краткое описание группы")
+    posts_count = models.PositiveIntegerField("Число постов", default=0,
+                                              editable=False)
 
     def __str__(self):
         return self.title
@@ -21,6 +25,7 @@ class Post(models.Model):
                                                      "публикации")
     pub_date = models.DateTimeField("Дата публикации", auto_now_add=True,
                                     db_index=True)
+    edited = models.DateTimeField("Дата изменения", auto_now=True)
     author = models.ForeignKey(User, on_delete=models.CASCADE,
                                related_name="posts",
                                verbose_name="Автор"
@@ -35,8 +40,13 @@ class Post(models.Model):
     image = models.ImageField(
         "Добоавьте картинку",
         upload_to="posts/",
+        storage=content_storage,
         blank=True
     )
+    thumbnails_ready = models.BooleanField("Миниатюры готовы",
+                                           default=False, editable=False)
+    comments_count = models.PositiveIntegerField("Число комментариев",
+                                                 default=0, editable=False)
 
     def __str__(self):
         return self.text[:CHARS_TO_OUTPUT]
@@ -46,8 +56,19 @@ class Post(models.Model):
             return f"{self.text[:50]}..."
         return self.text
 
+    @property
+    def cache_version(self):
+        """Версия карточки поста для кэша фрагментов."""
+        return f"{self.edited.timestamp():.6f}"
+
     class Meta:
         ordering = ["-pub_date"]
+        indexes = [
+            models.Index(fields=["author", "-pub_date"],
+                         name="post_author_pub_date_idx"),
+            models.Index(fields=["group", "-pub_date"],
+                         name="post_group_pub_date_idx"),
+        ]
         verbose_name = "Пост"
         verbose_name_plural = "Посты"
 
@@ -76,6 +97,10 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ["-created"]
+        indexes = [
+            models.Index(fields=["post", "-created"],
+                         name="comment_post_created_idx"),
+        ]
         verbose_name = "Комментарий"
         verbose_name_plural = "Комментарии"
 
@@ -89,3 +114,81 @@ class Follow(models.Model):
                                related_name="following",
                                verbose_name="Автор"
                                )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "author"],
+                                    name="unique_follow"),
+        ]
+        indexes = [
+            models.Index(fields=["author", "user"],
+                         name="follow_author_user_idx"),
+        ]
+
+
+class AuthorStats(models.Model):
+    """Денормализованные счетчики пользователя (см. posts.counters)."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE,
+                                primary_key=True,
+                                related_name="stats",
+                                verbose_name="Пользователь"
+                                )
+    posts_count = models.PositiveIntegerField("Число постов", default=0)
+    followers_count = models.PositiveIntegerField("Число подписчиков",
+                                                  default=0)
+    following_count = models.PositiveIntegerField("Число подписок",
+                                                  default=0)
+
+    def __str__(self):
+        return str(self.user)
+
+    class Meta:
+        verbose_name = "Счетчики автора"
+        verbose_name_plural = "Счетчики авторов"
+
+
+class StoredImage(models.Model):
+    """Файл картинки и число постов, которые на него ссылаются."""
+    name = models.CharField("Файл", max_length=255, unique=True)
+    refs = models.PositiveIntegerField("Число ссылок", default=0)
+    released = models.DateTimeField("Без ссылок с", null=True, blank=True,
+                                    db_index=True)
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        verbose_name = "Файл картинки"
+        verbose_name_plural = "Файлы картинок"
+
+
+class TimelineEntry(models.Model):
+    """Материализованная лента подписок: строка на пару (подписчик, пост)."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE,
+                             related_name="timeline",
+                             verbose_name="Подписчик"
+                             )
+    post = models.ForeignKey(Post, on_delete=models.CASCADE,
+                             related_name="timeline_entries",
+                             verbose_name="Пост"
+                             )
+    author = models.ForeignKey(User, on_delete=models.CASCADE,
+                               related_name="+",
+                               verbose_name="Автор"
+                               )
+    pub_date = models.DateTimeField("Дата публикации")
+
+    class Meta:
+        ordering = ["-pub_date", "-post_id"]
+        constraints = [
+            models.UniqueConstraint(fields=["user", "post"],
+                                    name="unique_timeline_entry"),
+        ]
+        indexes = [
+            models.Index(fields=["user", "-pub_date", "-post"],
+                         name="timeline_user_pub_date_idx"),
+            models.Index(fields=["user", "author"],
+                         name="timeline_user_author_idx"),
+        ]
+        verbose_name = "Запись ленты"
+        verbose_name_plural = "Записи ленты"
@@ -0,0 +1,313 @@
+import base64
+import binascii
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import InvalidPage, Page, Paginator
+from django.core.exceptions import EmptyResultSet
+from django.db import connection
+from django.db.models import Q
+from django.http import Http404
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+from .caching import FEED, changed_at, markers_shared
+
+CURSOR_PARAMS = ("after", "before")
+COUNT_PREFIX = "posts:count"
+
+_count_executor = None
+_count_lock = threading.Lock()
+
+
+def encode_cursor(values):
+    raw = "|".join(
+        value.isoformat() if hasattr(value, "isoformat") else str(value)
+        for value in values
+    )
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    """Возвращает (pub_date, id) из токена или None, если токен битый."""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        date_part, id_part = raw.rsplit("|", 1)
+        pub_date = parse_datetime(date_part)
+        if pub_date is None:
+            return None
+        return pub_date, int(id_part)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+
+def use_cursor_pagination(request):
+    if getattr(settings, "POSTS_CURSOR_PAGINATION", False):
+        return True
+    return any(request.GET.get(param) for param in CURSOR_PARAMS)
+
+
+class CursorPage(Page):
+    """Страница keyset-пагинации: знает только соседей, а не свой номер."""
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        super().__init__(object_list, None, paginator)
+        self._has_next = has_next
+        self._has_previous = has_previous
+        # Курсоры считаются сразу: представление может заменить object_list
+        # (например, записи ленты на сами посты).
+        self.next_cursor = None
+        self.previous_cursor = None
+        if object_list:
+            if has_next:
+                self.next_cursor = paginator.cursor_for(object_list[-1])
+            if has_previous:
+                self.previous_cursor = paginator.cursor_for(object_list[0])
+
+    def __repr__(self):
+        return "<Cursor page>"
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def next_page_number(self):
+        raise InvalidPage("У страницы по курсору нет номеров: "
+                          "используйте next_cursor.")
+
+    def previous_page_number(self):
+        raise InvalidPage("У страницы по курсору нет номеров: "
+                          "используйте previous_cursor.")
+
+    def start_index(self):
+        return None
+
+    def end_index(self):
+        return None
+
+
+class CursorPaginator(Paginator):
+    """Пагинация по ключу (pub_date, id) без COUNT(*) и OFFSET.
+
+    Стоимость любой страницы равна стоимости первой: запрос всегда
+    начинается с позиции курсора в индексе по дате публикации.
+    """
+    def __init__(self, object_list, per_page, keys=("pub_date", "id")):
+        super().__init__(object_list, per_page)
+        self.keys = keys
+
+    def key_of(self, obj):
+        # Строки .values() приходят словарями, объекты — моделями.
+        if isinstance(obj, dict):
+            return tuple(obj[key] for key in self.keys)
+        return tuple(getattr(obj, key) for key in self.keys)
+
+    def cursor_for(self, obj):
+        return encode_cursor(self.key_of(obj))
+
+    def _seek(self, queryset, cursor, newer):
+        date_key, id_key = self.keys
+        pub_date, pk = cursor
+        lookup = "gt" if newer else "lt"
+        return queryset.filter(
+            Q(**{f"{date_key}__{lookup}": pub_date})
+            | Q(**{date_key: pub_date, f"{id_key}__{lookup}": pk})
+        )
+
+    def cursor_page(self, after=None, before=None):
+        date_key, id_key = self.keys
+        queryset = self.object_list
+        after = decode_cursor(after) if after else None
+        before = decode_cursor(before) if before else None
+        if before and not after:
+            queryset = self._seek(queryset, before, newer=True)
+            queryset = queryset.order_by(date_key, id_key)
+            rows = list(queryset[:self.per_page + 1])
+            if rows:
+                has_previous = len(rows) > self.per_page
+                rows = rows[:self.per_page]
+                rows.reverse()
+                # Курсор мог быть собран руками: старше страницы может
+                # ничего не быть.
+                has_next = self._seek(self.object_list,
+                                      self.key_of(rows[-1]),
+                                      newer=False).exists()
+                return CursorPage(rows, self, has_next=has_next,
+                                  has_previous=has_previous)
+            # Новее курсора постов нет: показываем начало ленты.
+            queryset = self.object_list
+        if after:
+            queryset = self._seek(queryset, after, newer=False)
+        queryset = queryset.order_by(f"-{date_key}", f"-{id_key}")
+        rows = list(queryset[:self.per_page + 1])
+        has_next = len(rows) > self.per_page
+        return CursorPage(rows[:self.per_page], self, has_next=has_next,
+                          has_previous=after is not None)
+
+
+def _count_in_worker(key, queryset, marker):
+    try:
+        cache.set(key, (marker, queryset.count(), time.time()), None)
+    finally:
+        cache.delete(f"{key}:refresh")
+        connection.close()
+
+
+def refresh_count(key, queryset, marker):
+    """Пересчитывает count в фоне, не больше одного раза на ключ."""
+    global _count_executor
+    if not cache.add(f"{key}:refresh", True, 60):
+        return
+    with _count_lock:
+        if _count_executor is None:
+            _count_executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="page-counts")
+    _count_executor.submit(_count_in_worker, key, queryset, marker)
+
+
+def cached_count(queryset, scopes):
+    """COUNT(*) queryset, закэшированный до изменения областей scopes.
+
+    После изменения большие выборки (от PAGINATOR_APPROXIMATE_COUNT)
+    еще PAGINATOR_COUNT_MAX_AGE секунд получают прежнее значение, а
+    точное считается в фоне: на номерах страниц это почти не заметно.
+    """
+    if not markers_shared():
+        return queryset.count()
+    try:
+        sql, params = queryset.query.sql_with_params()
+    except EmptyResultSet:
+        return 0
+    digest = hashlib.md5(repr((sql, params)).encode()).hexdigest()
+    key = f"{COUNT_PREFIX}:{digest}"
+    marker = changed_at(*scopes)
+    entry = cache.get(key)
+    if entry is not None:
+        counted_marker, count, counted_at = entry
+        if counted_marker == marker:
+            return count
+        if (count >= settings.PAGINATOR_APPROXIMATE_COUNT
+                and time.time() - counted_at
+                < settings.PAGINATOR_COUNT_MAX_AGE):
+            refresh_count(key, queryset, marker)
+            return count
+    count = queryset.count()
+    cache.set(key, (marker, count, time.time()), None)
+    return count
+
+
+class BoundedPaginator(Paginator):
+    """Номерная пагинация длинных лент.
+
+    count кэшируется под метками областей (см. cached_count), число
+    страниц ограничено PAGINATOR_MAX_PAGES, а page.page_links содержит
+    окно номеров вокруг текущей страницы вместо всего page_range.
+    С cursor_keys последняя доступная страница получает next_cursor,
+    чтобы ленту можно было листать дальше курсором.
+    """
+    def __init__(self, object_list, per_page, orphans=0,
+                 allow_empty_first_page=True, scopes=(FEED,),
+                 cursor_keys=None):
+        super().__init__(object_list, per_page, orphans,
+                         allow_empty_first_page)
+        self.scopes = scopes
+        self.cursor_keys = cursor_keys
+
+    @cached_property
+    def count(self):
+        if not hasattr(self.object_list, "query"):
+            return Paginator.count.func(self)
+        return cached_count(self.object_list, self.scopes)
+
+    @cached_property
+    def num_pages(self):
+        return min(Paginator.num_pages.func(self),
+                   settings.PAGINATOR_MAX_PAGES)
+
+    @property
+    def truncated(self):
+        return Paginator.num_pages.func(self) > self.num_pages
+
+    def page_links(self, number, on_each_side=2, on_ends=1):
+        """Номера страниц для ссылок; None — пропуск («…»)."""
+        last = self.num_pages
+        shown = set(range(max(1, number - on_each_side),
+                          min(last, number + on_each_side) + 1))
+        shown.update(range(1, min(on_ends, last) + 1))
+        shown.update(range(max(1, last - on_ends + 1), last + 1))
+        links = []
+        previous = 0
+        for page in sorted(shown):
+            if page - previous == 2:
+                links.append(page - 1)
+            elif page - previous > 2:
+                links.append(None)
+            links.append(page)
+            previous = page
+        return links
+
+    def _get_page(self, object_list, number, paginator):
+        page = super()._get_page(object_list, number, paginator)
+        page.page_links = self.page_links(number)
+        if (self.cursor_keys and number == self.num_pages
+                and self.truncated):
+            page.object_list = list(page.object_list)
+            if page.object_list:
+                last = page.object_list[-1]
+                page.next_cursor = encode_cursor(
+                    getattr(last, key) for key in self.cursor_keys)
+        return page
+
+
+def page_or_404(paginator, number):
+    """Страница по номеру из запроса по правилам ListView.
+
+    Одинаково для представлений-классов и функций: "last" — последняя
+    страница, нечисловой номер и номер за пределами ленты, в том числе
+    дальше PAGINATOR_MAX_PAGES, дают 404.
+    """
+    number = number or 1
+    if number == "last":
+        number = paginator.num_pages
+    try:
+        return paginator.page(int(number))
+    except (ValueError, InvalidPage) as error:
+        raise Http404(f"Нет страницы {number}: {error}")
+
+
+class CursorPaginationMixin:
+    """Включает keyset-пагинацию в ListView по параметрам after/before."""
+    cursor_keys = ("pub_date", "id")
+    paginator_class = BoundedPaginator
+
+    def get_count_scopes(self):
+        return [FEED]
+
+    def get_paginator(self, queryset, per_page, **kwargs):
+        kwargs.setdefault("scopes", self.get_count_scopes())
+        kwargs.setdefault("cursor_keys", self.cursor_keys)
+        return super().get_paginator(queryset, per_page, **kwargs)
+
+    def paginate_queryset(self, queryset, page_size):
+        if use_cursor_pagination(self.request):
+            paginator = CursorPaginator(queryset, page_size, self.cursor_keys)
+            page = paginator.cursor_page(
+                after=self.request.GET.get("after"),
+                before=self.request.GET.get("before"),
+            )
+        else:
+            paginator = self.get_paginator(
+                queryset, page_size, orphans=self.get_paginate_orphans(),
+                allow_empty_first_page=self.get_allow_empty())
+            page = page_or_404(paginator, self.kwargs.get(self.page_kwarg)
+                               or self.request.GET.get(self.page_kwarg))
+        return paginator, page, page.object_list, page.has_other_pages()
+
@@ -0,0 +1,145 @@
+"""Полнотекстовый поиск по постам на индексе SQLite FTS5.
+
+Индекс хранит только ссылки на posts_post (external content), а
+триггеры держат его в синхронизации с Post.text при любой записи,
+включая bulk_create и update(), которые не посылают сигналов.
+"""
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+from .models import Post
+
+FTS_TABLE = "posts_post_fts"
+TRIGGERS = {
+    f"{FTS_TABLE}_ai": (
+        f"AFTER INSERT ON posts_post BEGIN "
+        f"INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text); "
+        f"END"
+    ),
+    f"{FTS_TABLE}_ad": (
+        f"AFTER DELETE ON posts_post BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text) "
+        f"VALUES ('delete', old.id, old.text); "
+        f"END"
+    ),
+    f"{FTS_TABLE}_au": (
+        f"AFTER UPDATE OF text ON posts_post BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text) "
+        f"VALUES ('delete', old.id, old.text); "
+        f"INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text); "
+        f"END"
+    ),
+}
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def is_supported(conn=connection):
+    return conn.vendor == "sqlite"
+
+
+def install(conn=connection):
+    """Создает таблицу FTS5 и триггеры, если их нет.
+
+    SQLite пересоздает posts_post при части миграций и теряет триггеры,
+    поэтому установка повторяется после каждого migrate; если чего-то
+    не хватало, индекс перестраивается целиком.
+    """
+    if (not is_supported(conn)
+            or "posts_post" not in conn.introspection.table_names()):
+        return False
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE name IN (%s)"
+            % ", ".join(["%s"] * (len(TRIGGERS) + 1)),
+            [FTS_TABLE, *TRIGGERS],
+        )
+        existing = {row[0] for row in cursor.fetchall()}
+        if len(existing) == len(TRIGGERS) + 1:
+            return False
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            f"text, content='posts_post', content_rowid='id', "
+            f"tokenize='unicode61 remove_diacritics 2')"
+        )
+        for name, body in TRIGGERS.items():
+            cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+        rebuild(conn)
+    return True
+
+
+def rebuild(conn=connection):
+    with conn.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def uninstall(conn=connection):
+    if not is_supported(conn):
+        return
+    with conn.cursor() as cursor:
+        for name in TRIGGERS:
+            cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+        cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+def fts_query(text):
+    """Превращает пользовательский ввод в безопасный запрос MATCH.
+
+    Каждое слово берется в кавычки (операторы FTS5 не срабатывают) и
+    ищется по префиксу; слова объединяются через AND.
+    """
+    return " ".join(f'"{token}"*' for token in TOKEN_RE.findall(text))
+
+
+def matching_ids(text):
+    """Подзапрос id постов для фильтра id__in (без ранжирования)."""
+    return RawSQL(
+        f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s",
+        (fts_query(text),),
+    )
+
+
+class SearchResults:
+    """Ранжированная выдача FTS5 для Paginator: count() и срезы."""
+
+    def __init__(self, text):
+        self.match = fts_query(text)
+
+    def count(self):
+        if not self.match:
+            return 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT COUNT(*) FROM {FTS_TABLE} "
+                f"WHERE {FTS_TABLE} MATCH %s",
+                [self.match],
+            )
+            return cursor.fetchone()[0]
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+        if not self.match:
+            return []
+        start = key.start or 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s "
+                f"ORDER BY rank LIMIT %s OFFSET %s",
+                [self.match, key.stop - start, start],
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+        posts = Post.objects.select_related("author", "group").in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
+
+
+def search_posts(text):
+    if is_supported():
+        return SearchResults(text)
+    return Post.objects.select_related("author", "group").filter(
+        text__icontains=text)
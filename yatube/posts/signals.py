@@ -0,0 +1,181 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import caching, counters, timeline
+from .models import AuthorStats, Comment, Follow, Group, Post, User
+
+NAME_FIELDS = ("username", "first_name", "last_name")
+
+
+@receiver(post_save, sender=User)
+def create_author_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        AuthorStats.objects.get_or_create(user=instance)
+
+
+@receiver(pre_save, sender=User)
+def remember_user_names(sender, instance, raw=False, update_fields=None,
+                        **kwargs):
+    instance._saved_names = None
+    # Вход в систему сохраняет только last_login.
+    names_saved = (update_fields is None
+                   or set(update_fields).intersection(NAME_FIELDS))
+    if instance.pk and not raw and names_saved:
+        instance._saved_names = User.objects.filter(
+            pk=instance.pk).values_list(*NAME_FIELDS).first()
+
+
+@receiver(pre_save, sender=Post)
+def remember_post_group(sender, instance, raw=False, **kwargs):
+    instance._saved_group_id = None
+    instance._saved_image = ""
+    if instance.pk and not raw:
+        instance._saved_group_id, instance._saved_image = (
+            Post.objects.filter(pk=instance.pk).values_list(
+                "group_id", "image").first() or (None, ""))
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.fan_out(instance)
+
+
+@receiver(post_save, sender=Post)
+def count_post(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        counters.bump_author(instance.author_id, "posts_count", 1)
+        counters.bump_group(instance.group_id, 1)
+    elif instance._saved_group_id != instance.group_id:
+        counters.bump_group(instance._saved_group_id, -1)
+        counters.bump_group(instance.group_id, 1)
+
+
+@receiver(post_delete, sender=Post)
+def uncount_post(sender, instance, **kwargs):
+    counters.bump_author(instance.author_id, "posts_count", -1)
+    counters.bump_group(instance.group_id, -1)
+
+
+@receiver(post_save, sender=Post)
+def count_image_refs(sender, instance, created, raw=False, **kwargs):
+    if raw or instance.image.name == instance._saved_image:
+        return
+    counters.retain_image(instance.image.name)
+    counters.release_image(instance._saved_image)
+
+
+@receiver(post_save, sender=Post)
+def reset_thumbnails_ready(sender, instance, created, raw=False, **kwargs):
+    if raw or instance.image.name == instance._saved_image:
+        return
+    # Тот же файл у другого поста: миниатюры уже созданы.
+    ready = bool(instance.image) and Post.objects.filter(
+        image=instance.image.name, thumbnails_ready=True,
+    ).exclude(pk=instance.pk).exists()
+    if ready != instance.thumbnails_ready:
+        Post.objects.filter(pk=instance.pk).update(thumbnails_ready=ready)
+        instance.thumbnails_ready = ready
+
+
+@receiver(post_delete, sender=Post)
+def release_image(sender, instance, **kwargs):
+    counters.release_image(instance.image.name)
+
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.bump_post_comments(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_comment(sender, instance, **kwargs):
+    counters.bump_post_comments(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.backfill(instance.user_id, instance.author_id)
+        counters.bump_author(instance.author_id, "followers_count", 1)
+        counters.bump_author(instance.user_id, "following_count", 1)
+
+
+@receiver(post_delete, sender=Follow)
+def trim_timeline(sender, instance, **kwargs):
+    timeline.trim(instance.user_id, instance.author_id)
+    counters.bump_author(instance.author_id, "followers_count", -1)
+    counters.bump_author(instance.user_id, "following_count", -1)
+
+
+def _username(user_id):
+    return User.objects.filter(pk=user_id).values_list(
+        "username", flat=True).first()
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def touch_post_scopes(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    group_ids = {instance.group_id, getattr(instance, "_saved_group_id", None)}
+    slugs = Group.objects.filter(pk__in=group_ids - {None}).values_list(
+        "slug", flat=True)
+    caching.touch(
+        caching.FEED,
+        caching.scope("post", instance.pk),
+        caching.scope("author", _username(instance.author_id)),
+        *(caching.scope("group", slug) for slug in slugs),
+    )
+
+
+@receiver(post_save, sender=User)
+def touch_user_scopes(sender, instance, created, raw=False, **kwargs):
+    saved = getattr(instance, "_saved_names", None)
+    if raw or created or saved is None:
+        return
+    if saved == tuple(getattr(instance, name) for name in NAME_FIELDS):
+        return
+    # Имя и ссылка на профиль автора видны в карточках его постов на
+    # всех лентах и на страницах самих постов.
+    caching.touch(caching.scope("author", saved[0]))
+    caching.touch_posts(Post.objects.filter(author=instance))
+
+
+@receiver(pre_save, sender=Group)
+def remember_group_slug(sender, instance, raw=False, **kwargs):
+    instance._saved_slug = None
+    if instance.pk and not raw:
+        instance._saved_slug = Group.objects.filter(
+            pk=instance.pk).values_list("slug", flat=True).first()
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def touch_group_scopes(sender, instance, raw=False, **kwargs):
+    # Лента показывает ссылки на группы постов.
+    if not raw:
+        slugs = {instance.slug, getattr(instance, "_saved_slug", None)}
+        caching.touch(caching.FEED, *(
+            caching.scope("group", slug) for slug in slugs - {None}))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def touch_comment_scopes(sender, instance, raw=False, **kwargs):
+    if not raw:
+        caching.touch(caching.scope("post", instance.post_id))
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def touch_follow_scopes(sender, instance, raw=False, **kwargs):
+    # Счетчики подписок видны в профилях обоих пользователей.
+    if not raw:
+        caching.touch(
+            caching.scope("author", _username(instance.author_id)),
+            caching.scope("author", _username(instance.user_id)),
+        )
@@ -0,0 +1,99 @@
+"""Хранилище картинок постов по содержимому.
+
+Файл сохраняется под sha256 своего содержимого:
+posts/ab/cd/abcd...ef.jpg. Одинаковые загрузки получают одно имя, так
+что повторный мем не занимает место и не порождает второй набор
+миниатюр sorl: имена миниатюр выводятся из имени исходника.
+
+Загрузка читается один раз, кусками: они хешируются и сразу пишутся во
+временный файл рядом с целевым каталогом, который затем атомарно
+переименовывается, если такого содержимого еще нет.
+
+Сколько постов ссылается на файл, хранит StoredImage (см.
+posts.counters); файлы, оставшиеся без ссылок дольше
+IMAGE_COLLECT_GRACE секунд, удаляет вместе с миниатюрами команда
+collect_images.
+"""
+import hashlib
+import os
+import posixpath
+import tempfile
+from datetime import timedelta
+
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.utils import timezone
+from django.utils.deconstruct import deconstructible
+
+CHUNK_SIZE = 64 * 1024
+INCOMING = ".incoming"
+DEFAULT_FILE_MODE = 0o644
+
+
+def content_name(prefix, hexdigest, extension):
+    return posixpath.join(prefix, hexdigest[:2], hexdigest[2:4],
+                          hexdigest + extension.lower())
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """FileSystemStorage, который именует файлы хешем содержимого."""
+
+    def get_available_name(self, name, max_length=None):
+        # Совпадение имени означает то же содержимое, суффикс не нужен.
+        return name
+
+    def _save(self, name, content):
+        prefix, filename = posixpath.split(name.replace("\\", "/"))
+        incoming = self.path(posixpath.join(prefix, INCOMING))
+        os.makedirs(incoming, exist_ok=True)
+        digest = hashlib.sha256()
+        fd, temp_path = tempfile.mkstemp(dir=incoming)
+        try:
+            with os.fdopen(fd, "wb") as temp:
+                for chunk in content.chunks(CHUNK_SIZE):
+                    digest.update(chunk)
+                    temp.write(chunk)
+            name = content_name(prefix, digest.hexdigest(),
+                                os.path.splitext(filename)[1])
+            path = self.path(name)
+            if os.path.exists(path):
+                # Свежая дата защищает файл от collect(), пока пост
+                # с ним еще не сохранен.
+                os.utime(path)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.chmod(temp_path,
+                         self.file_permissions_mode or DEFAULT_FILE_MODE)
+                # Одновременная загрузка того же файла запишет те же байты.
+                os.replace(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        return name
+
+
+content_storage = ContentAddressedStorage()
+
+
+def collect(grace):
+    """Удаляет файлы без ссылок и их миниатюры; возвращает их число."""
+    from sorl.thumbnail import delete
+
+    from .models import StoredImage
+    from .thumbnails import source_file
+
+    deadline = timezone.now() - timedelta(seconds=grace)
+    removed = 0
+    for image in StoredImage.objects.filter(refs=0, released__lte=deadline):
+        if (content_storage.exists(image.name)
+                and content_storage.get_modified_time(image.name) > deadline):
+            continue
+        with transaction.atomic():
+            # Ссылка могла появиться, пока шла сборка.
+            if not StoredImage.objects.filter(pk=image.pk, refs=0).delete()[0]:
+                continue
+            content_storage.delete(image.name)
+        delete(source_file(image.name), delete_file=False)
+        removed += 1
+    return removed
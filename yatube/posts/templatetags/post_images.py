@@ -0,0 +1,11 @@
+from django import template
+
+from posts import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def ready_picture(post):
+    """Производные картинки поста или None, если они еще генерируются."""
+    return thumbnails.ready_picture(post)
@@ -0,0 +1,101 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, Client
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class PostsApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username="author")
+        cls.reader = User.objects.create_user(username="reader")
+        cls.group = Group.objects.create(
+            title="test-group",
+            slug="test-slug",
+            description="test-description",
+        )
+        cls.posts = [
+            Post.objects.create(author=cls.author, group=cls.group,
+                                text=f"post {index}")
+            for index in range(3)
+        ]
+        cls.comment = Comment.objects.create(
+            post=cls.posts[0], author=cls.reader, text="comment")
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_feeds(self):
+        """Ленты API отдают посты новыми первыми."""
+        urls = [
+            reverse("posts:api_posts"),
+            reverse("posts:api_group_posts",
+                    kwargs={"slug": self.group.slug}),
+            reverse("posts:api_profile_posts",
+                    kwargs={"username": self.author.username}),
+            reverse("posts:api_follow"),
+        ]
+        expected = [post.pk for post in reversed(self.posts)]
+        for url in urls:
+            with self.subTest(url=url):
+                data = self.reader_client.get(url).json()
+                self.assertEqual(
+                    [item["id"] for item in data["results"]], expected)
+                self.assertEqual(data["results"][0]["author"], "author")
+                self.assertEqual(data["results"][0]["group"], "test-slug")
+
+    def test_cursor_pagination(self):
+        """Курсор next ведет на следующую страницу без повторов."""
+        url = reverse("posts:api_posts")
+        first = self.client.get(url, {"limit": 2}).json()
+        second = self.client.get(
+            url, {"limit": 2, "after": first["next"]}).json()
+        self.assertEqual(len(first["results"]), 2)
+        self.assertEqual([item["id"] for item in second["results"]],
+                         [self.posts[0].pk])
+        self.assertIsNone(second["next"])
+
+    def test_fields_selection(self):
+        """fields оставляет только запрошенные поля."""
+        data = self.client.get(reverse("posts:api_posts"),
+                               {"fields": "id,author"}).json()
+        self.assertEqual(set(data["results"][0]), {"id", "author"})
+        response = self.client.get(reverse("posts:api_posts"),
+                                   {"fields": "id,password"})
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertIn("password", response.json()["detail"])
+
+    def test_post_detail_with_comments(self):
+        """Пост отдается вместе с комментариями."""
+        data = self.client.get(reverse(
+            "posts:api_post", kwargs={"post_id": self.posts[0].pk})).json()
+        self.assertEqual(data["text"], "post 0")
+        self.assertEqual(
+            [(item["author"], item["text"])
+             for item in data["comments"]["results"]],
+            [("reader", "comment")])
+
+    def test_errors_are_json(self):
+        """Ошибки отдаются в JSON с нужным статусом."""
+        cases = {
+            reverse("posts:api_follow"): HTTPStatus.UNAUTHORIZED,
+            reverse("posts:api_post",
+                    kwargs={"post_id": 10 ** 6}): HTTPStatus.NOT_FOUND,
+            reverse("posts:api_group_posts",
+                    kwargs={"slug": "missing"}): HTTPStatus.NOT_FOUND,
+        }
+        for url, status in cases.items():
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, status)
+                self.assertIn("detail", response.json())
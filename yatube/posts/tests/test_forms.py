@@ -1,11 +1,13 @@
 import shutil
 import tempfile
+from io import BytesIO
 
 from django.contrib.auth import get_user_model
 from django.conf import settings
 from django.test import TestCase, Client, override_settings
 from django.urls import reverse
 from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image
 
 from ..forms import PostForm, CommentForm
 from ..models import Group, Post, Comment
@@ -65,7 +67,10 @@ class PostCreateFormTests(TestCase):
         form_data = {
             "text": "Тестовый текст",
             "group": self.group.id,
-            "image": self.uploaded
+            # cls.uploaded уже прочитан при создании поста в setUpClass.
+            "image": SimpleUploadedFile(name="small.gif",
+                                        content=self.small_gif,
+                                        content_type="image/gif"),
         }
         response = self.client_author.post(
             reverse("posts:post_create"),
@@ -81,6 +86,8 @@ class PostCreateFormTests(TestCase):
         self.assertEqual(Post.objects.count(), posts_count + 1)
         self.assertEqual(new_post.author, self.author)
         self.assertEqual(new_post.group, self.group)
+        self.assertRegex(new_post.image.name,
+                         r"^posts/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.jpg$")
 
     def test_edit_post(self):
         """Валидная форма релактирует запись в Post."""
@@ -116,6 +123,54 @@ class PostCreateFormTests(TestCase):
             1)
 
 
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POST_IMAGE_MAX_SIZE=(100, 100))
+class PostImageIngestTests(TestCase):
+    @staticmethod
+    def upload(size, mode="RGB", format_="JPEG", **save_options):
+        buffer = BytesIO()
+        Image.new(mode, size, "red").save(buffer, format_, **save_options)
+        return SimpleUploadedFile(f"photo.{format_.lower()}",
+                                  buffer.getvalue())
+
+    def clean_image(self, upload):
+        form = PostForm(data={"text": "text"}, files={"image": upload})
+        self.assertTrue(form.is_valid(), form.errors)
+        return Image.open(form.cleaned_data["image"])
+
+    def test_image_rotated_downscaled_and_stripped(self):
+        """Картинка повернута по EXIF, уменьшена и без метаданных."""
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        exif[0x010F] = "Camera"
+        image = self.clean_image(
+            self.upload((400, 200), exif=exif.tobytes()))
+        self.assertEqual(image.format, "JPEG")
+        self.assertEqual(image.size, (50, 100))
+        self.assertEqual(dict(image.getexif()), {})
+
+    def test_transparent_image_kept_as_png(self):
+        """Картинка с прозрачностью остается PNG."""
+        image = self.clean_image(
+            self.upload((300, 300), mode="RGBA", format_="PNG"))
+        self.assertEqual(image.format, "PNG")
+        self.assertEqual(image.size, (100, 100))
+
+    def test_cmyk_profile_dropped_after_conversion(self):
+        """У CMYK-картинки, переведенной в RGB, нет CMYK-профиля."""
+        image = self.clean_image(self.upload(
+            (200, 200), mode="CMYK", icc_profile=b"cmyk profile"))
+        self.assertEqual(image.mode, "RGB")
+        self.assertNotIn("icc_profile", image.info)
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=100)
+    def test_too_many_pixels_rejected(self):
+        """Слишком большая по пикселям картинка не проходит валидацию."""
+        form = PostForm(data={"text": "text"},
+                        files={"image": self.upload((20, 20))})
+        self.assertFalse(form.is_valid())
+        self.assertIn("image", form.errors)
+
+
 class CommentCreateFormTests(TestCase):
     @classmethod
     def setUpClass(cls):
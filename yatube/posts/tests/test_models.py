@@ -1,7 +1,8 @@
 from django.contrib.auth import get_user_model
+from django.db import IntegrityError
 from django.test import TestCase
 
-from ..models import Group, Post
+from ..models import Follow, Group, Post
 
 User = get_user_model()
 
@@ -74,3 +75,13 @@ class PostModelTest(TestCase):
             with self.subTest(value=value):
                 self.assertEqual(
                     task._meta.get_field(value).help_text, expected)
+
+
+class FollowModelTest(TestCase):
+    def test_follow_is_unique(self):
+        """Повторная подписка на того же автора не создает дубль."""
+        user = User.objects.create_user(username="user")
+        author = User.objects.create_user(username="author")
+        Follow.objects.create(user=user, author=author)
+        with self.assertRaises(IntegrityError):
+            Follow.objects.create(user=user, author=author)
@@ -0,0 +1,96 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# Наибольшее число запросов на страницу при любом числе постов на ней.
+MAX_QUERIES = {
+    "posts:index": 4,
+    "posts:group_list": 5,
+    "posts:profile": 6,
+    "posts:follow_index": 4,
+    # Плюс запрос автора поста для ETag.
+    "posts:post_detail": 5,
+}
+
+
+class QueryCountTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username="reader")
+        cls.author = User.objects.create_user(username="author")
+        cls.group = Group.objects.create(
+            title="test-group",
+            slug="test-slug",
+            description="test-description",
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.post = cls.create_posts(1)[0]
+
+    @classmethod
+    def create_posts(cls, count):
+        return [
+            Post.objects.create(author=cls.author, group=cls.group,
+                                text=f"post {index}")
+            for index in range(count)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(url)
+        return len(context.captured_queries)
+
+    def assertQueriesStable(self, name, url, grow):
+        """Число запросов не растет, когда на странице больше объектов."""
+        before = self.count_queries(url)
+        grow()
+        after = self.count_queries(url)
+        self.assertEqual(before, after)
+        self.assertLessEqual(after, MAX_QUERIES[name])
+
+    def test_feeds(self):
+        """Ленты делают одинаковое число запросов на 1 и на полную
+        страницу постов."""
+        urls = {
+            "posts:index": reverse("posts:index"),
+            "posts:group_list": reverse(
+                "posts:group_list", kwargs={"slug": self.group.slug}),
+            "posts:profile": reverse(
+                "posts:profile", kwargs={"username": self.author.username}),
+            "posts:follow_index": reverse("posts:follow_index"),
+        }
+        for name, url in urls.items():
+            with self.subTest(name=name):
+                self.assertQueriesStable(
+                    name, url,
+                    lambda: self.create_posts(settings.POSTS_TO_OUTPUT))
+
+    def test_post_detail(self):
+        """Страница поста не подгружает авторов комментариев по одному."""
+        def add_comments():
+            for index in range(5):
+                Comment.objects.create(
+                    post=self.post,
+                    author=User.objects.create_user(username=f"c{index}"),
+                    text="comment",
+                )
+
+        self.assertQueriesStable(
+            "posts:post_detail",
+            reverse("posts:post_detail", kwargs={"post_id": self.post.id}),
+            add_comments,
+        )
@@ -0,0 +1,110 @@
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+
+from .. import counters, thumbnails
+from ..models import Post, StoredImage
+from ..storage import content_storage
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ContentAddressedStorageTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username="author")
+        buffer = BytesIO()
+        Image.new("RGB", (10, 10), "red").save(buffer, "JPEG")
+        cls.meme = buffer.getvalue()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create_post(self, content=None, name="meme.jpg"):
+        return Post.objects.create(
+            author=self.author, text="text",
+            image=SimpleUploadedFile(name, content or self.meme))
+
+    def stored_files(self):
+        return [os.path.join(root, name)
+                for root, dirs, files in os.walk(TEMP_MEDIA_ROOT)
+                for name in files]
+
+    def test_duplicate_uploads_share_file(self):
+        """Одинаковые загрузки с разными именами хранятся одним файлом."""
+        before = set(self.stored_files())
+        first = self.create_post(name="meme.jpg")
+        second = self.create_post(name="copy.JPG")
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertRegex(first.image.name,
+                         r"^posts/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.jpg$")
+        self.assertEqual(set(self.stored_files()) - before,
+                         {content_storage.path(first.image.name)})
+        self.assertEqual(
+            StoredImage.objects.get(name=first.image.name).refs, 2)
+
+    def test_refs_follow_edits_and_deletes(self):
+        """Ссылки уменьшаются при замене картинки и удалении поста."""
+        first = self.create_post()
+        second = self.create_post()
+        name = first.image.name
+        first.image = SimpleUploadedFile("other.jpg", b"other")
+        first.save()
+        self.assertEqual(StoredImage.objects.get(name=name).refs, 1)
+        self.assertEqual(
+            StoredImage.objects.get(name=first.image.name).refs, 1)
+        second.delete()
+        image = StoredImage.objects.get(name=name)
+        self.assertEqual(image.refs, 0)
+        self.assertIsNotNone(image.released)
+
+    def test_collect_removes_unreferenced_files(self):
+        """collect_images удаляет только давно освобожденные файлы."""
+        kept = self.create_post(b"kept", "kept.jpg")
+        released = self.create_post()
+        name = released.image.name
+        released.delete()
+        call_command("collect_images", stdout=StringIO())
+        self.assertTrue(content_storage.exists(name))
+
+        past = timezone.now() - timedelta(hours=2)
+        StoredImage.objects.filter(name=name).update(released=past)
+        os.utime(content_storage.path(name),
+                 (past.timestamp(), past.timestamp()))
+        call_command("collect_images", stdout=StringIO())
+        self.assertFalse(content_storage.exists(name))
+        self.assertFalse(StoredImage.objects.filter(name=name).exists())
+        self.assertTrue(content_storage.exists(kept.image.name))
+
+    def test_recount_restores_refs(self):
+        """recount восстанавливает ссылки по постам."""
+        post = self.create_post()
+        StoredImage.objects.all().delete()
+        counters.recount()
+        self.assertEqual(StoredImage.objects.get(name=post.image.name).refs, 1)
+
+    def test_generated_thumbnails_found_for_uploaded_image(self):
+        """Миниатюры, созданные по имени файла, видны по FieldFile поста."""
+        post = self.create_post()
+        post.refresh_from_db()
+        self.assertFalse(thumbnails.is_ready(post.image))
+        self.assertTrue(thumbnails.generate(post.image.name))
+        self.assertTrue(thumbnails.is_ready(post.image))
+        thumbnails.mark_ready(post.image.name)
+        post.refresh_from_db()
+        self.assertIsNotNone(thumbnails.ready_picture(post))
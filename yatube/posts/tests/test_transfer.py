@@ -0,0 +1,108 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class TransferCommandsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username="author")
+        cls.reader = User.objects.create_user(username="reader")
+        cls.group = Group.objects.create(
+            title="test-group",
+            slug="test-slug",
+            description="test-description",
+        )
+
+    def setUp(self):
+        self.post = Post.objects.create(author=self.author, group=self.group,
+                                        text="exported post")
+        Comment.objects.create(post=self.post, author=self.reader,
+                               text="exported comment")
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir, ignore_errors=True)
+
+    def round_trip(self, extension):
+        paths = {}
+        for kind in ("posts", "comments", "follows"):
+            paths[kind] = os.path.join(self.dir, f"{kind}.{extension}")
+            call_command("export_posts", paths[kind], kind=kind,
+                         stdout=StringIO())
+        Post.objects.all().delete()
+        Follow.objects.all().delete()
+        for kind in ("posts", "comments", "follows"):
+            call_command("import_posts", paths[kind], kind=kind,
+                         stdout=StringIO())
+
+    def test_round_trip(self):
+        """Выгрузка и загрузка в JSONL и CSV сохраняют записи, id и даты,
+        а счетчики и ленты пересчитываются."""
+        for extension in ("jsonl", "csv"):
+            with self.subTest(extension=extension):
+                self.round_trip(extension)
+                post = Post.objects.select_related("author__stats").get()
+                self.assertEqual(post.pk, self.post.pk)
+                self.assertEqual(post.pub_date, self.post.pub_date)
+                self.assertEqual(post.group, self.group)
+                self.assertEqual(post.comments_count, 1)
+                self.assertEqual(post.author.stats.posts_count, 1)
+                self.assertEqual(post.comment.get().author, self.reader)
+                self.assertEqual(
+                    list(self.reader.timeline.values_list("post", flat=True)),
+                    [post.pk])
+
+    def test_import_is_idempotent(self):
+        """Повторная загрузка не дублирует записи."""
+        path = os.path.join(self.dir, "posts.jsonl")
+        call_command("export_posts", path, stdout=StringIO())
+        call_command("import_posts", path, stdout=StringIO())
+        self.assertEqual(Post.objects.count(), 1)
+
+    def import_jsonl(self, kind, rows):
+        path = os.path.join(self.dir, f"{kind}.jsonl")
+        with open(path, "w", encoding="utf-8") as stream:
+            for row in rows:
+                stream.write(json.dumps(row, ensure_ascii=False) + "\n")
+        out, err = StringIO(), StringIO()
+        call_command("import_posts", path, kind=kind, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_bad_rows_skipped(self):
+        """Записи без автора, с битой датой или к чужому посту
+        пропускаются с сообщением, остальные загружаются."""
+        date = "2021-01-01T00:00:00+00:00"
+        out, err = self.import_jsonl("posts", [
+            {"id": 100, "author": "new", "text": "ok", "pub_date": date},
+            {"id": 101, "author": None, "text": "no author",
+             "pub_date": date},
+            {"id": 102, "author": "new", "text": "bad date",
+             "pub_date": "yesterday"},
+            {"id": 103, "text": "no author field", "pub_date": date},
+        ])
+        self.assertIn("Загружено записей: 1", out)
+        self.assertIn("Пропущено записей: 3", err)
+        self.assertIn("Запись 2 пропущена", err)
+        self.assertEqual(set(Post.objects.values_list("pk", flat=True)),
+                         {self.post.pk, 100})
+        out, err = self.import_jsonl("comments", [
+            {"id": 200, "post": 100, "author": "reader", "text": "ok",
+             "created": date},
+            {"id": 201, "post": 999, "author": "reader", "text": "lost",
+             "created": date},
+        ])
+        self.assertIn("Загружено записей: 1", out)
+        self.assertIn("Запись 2 пропущена: нет поста 999", err)
+        self.assertEqual(list(Comment.objects.filter(
+            pk__in=[200, 201]).values_list("pk", flat=True)), [200])
@@ -1,15 +1,26 @@
+import json
 import shutil
 import tempfile
+from io import StringIO
+from unittest import mock
 
 from django import forms
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import TestCase, Client, override_settings
+from django.core.management import call_command
+from django.core.paginator import InvalidPage
+from django.db.models.sql.compiler import SQLInsertCompiler
+from django.test import (TestCase, TransactionTestCase, Client,
+                         override_settings)
 from django.urls import reverse
+from django.utils.dateparse import parse_datetime
 
-from ..models import Group, Post, Follow
+from .. import comment_queue, thumbnails
+from ..caching import post_card_key
+from ..paginators import BoundedPaginator, CursorPaginator
+from ..models import AuthorStats, Comment, Group, Post, Follow
 
 User = get_user_model()
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
@@ -200,6 +211,162 @@ class PaginatorViewsTest(TestCase):
                 self.assertEqual(len(response.context["page_obj"]), 5)
 
 
+class BoundedPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username="author")
+        Post.objects.bulk_create(
+            Post(author=cls.author, text=f"post {i}") for i in range(15))
+
+    def setUp(self):
+        cache.clear()
+
+    def test_page_links_are_elided(self):
+        """Вместо всех номеров — окно вокруг текущей страницы и края."""
+        paginator = BoundedPaginator(list(range(1000)), 10)
+        self.assertEqual(paginator.page_links(50),
+                         [1, None, 48, 49, 50, 51, 52, None, 100])
+        self.assertEqual(paginator.page_links(3),
+                         [1, 2, 3, 4, 5, None, 100])
+        self.assertEqual(paginator.page(4).page_links,
+                         [1, 2, 3, 4, 5, 6, None, 100])
+
+    @override_settings(PAGINATOR_MAX_PAGES=1)
+    def test_pages_capped_and_continued_by_cursor(self):
+        """Страницы дальше предела недоступны, последняя ведет курсором."""
+        response = self.client.get(reverse("posts:index"))
+        page = response.context["page_obj"]
+        self.assertEqual(page.paginator.num_pages, 1)
+        self.assertContains(response, f"?after={page.next_cursor}")
+        response = self.client.get(reverse("posts:index"), {"page": 2})
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get(reverse("posts:index"),
+                                   {"after": page.next_cursor})
+        self.assertEqual(len(response.context["page_obj"]), 5)
+
+    @override_settings(PAGINATOR_MAX_PAGES=1)
+    def test_page_past_cap_is_404_on_all_feeds(self):
+        """Номер дальше PAGINATOR_MAX_PAGES дает 404 и в ListView,
+        и в представлениях-функциях; последняя доступна как page=last."""
+        client = Client()
+        client.force_login(self.author)
+        Follow.objects.create(
+            user=User.objects.create_user(username="reader"),
+            author=self.author)
+        reader = Client()
+        reader.force_login(User.objects.get(username="reader"))
+        pages = {
+            reverse("posts:index"): client,
+            reverse("posts:profile", kwargs={"username": "author"}): client,
+            reverse("posts:follow_index"): reader,
+        }
+        for url, page_client in pages.items():
+            with self.subTest(url=url):
+                response = page_client.get(url, {"page": 2})
+                self.assertEqual(response.status_code, 404)
+                response = page_client.get(url, {"page": "last"})
+                self.assertEqual(response.context["page_obj"].number, 1)
+
+    def test_count_cached_until_posts_change(self):
+        """COUNT(*) выполняется заново только после изменения постов."""
+        self.assertEqual(BoundedPaginator(Post.objects.all(), 10).count, 15)
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                BoundedPaginator(Post.objects.all(), 10).count, 15)
+        Post.objects.create(author=self.author, text="new post")
+        self.assertEqual(BoundedPaginator(Post.objects.all(), 10).count, 16)
+
+    @override_settings(PAGINATOR_APPROXIMATE_COUNT=10)
+    def test_large_count_refreshed_in_background(self):
+        """Большой count после изменения отдается прежним и пересчитывается
+        в фоне."""
+        BoundedPaginator(Post.objects.all(), 10).count
+        Post.objects.create(author=self.author, text="new post")
+        with mock.patch("posts.paginators.refresh_count") as refresh:
+            count = BoundedPaginator(Post.objects.all(), 10).count
+        self.assertEqual(count, 15)
+        refresh.assert_called_once()
+
+
+@override_settings(POSTS_CURSOR_PAGINATION=True)
+class CursorPaginatorViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username="author")
+        cls.follower = User.objects.create_user(username="follower")
+        cls.group = Group.objects.create(
+            title="test-group",
+            slug="test-slug",
+            description="test-description",
+        )
+        Post.objects.bulk_create(
+            Post(author=cls.author, text=f"test text post number {i}",
+                 group=cls.group)
+            for i in range(15)
+        )
+        Follow.objects.create(user=cls.follower, author=cls.author)
+        cls.pages = [
+            reverse("posts:index"),
+            reverse("posts:group_list", kwargs={"slug": cls.group.slug}),
+            reverse("posts:profile",
+                    kwargs={"username": cls.author.username}),
+            reverse("posts:follow_index"),
+        ]
+
+    def setUp(self):
+        self.client_follower = Client()
+        self.client_follower.force_login(self.follower)
+
+    def test_cursor_pages_walk_forward_and_back(self):
+        """Курсорная пагинация отдает страницы без пересечений
+        в обе стороны на всех лентах."""
+        for url in self.pages:
+            with self.subTest(url=url):
+                first = self.client_follower.get(url).context["page_obj"]
+                self.assertEqual(len(first), 10)
+                self.assertFalse(first.has_previous())
+                second = self.client_follower.get(
+                    url, {"after": first.next_cursor}).context["page_obj"]
+                self.assertEqual(len(second), 5)
+                self.assertFalse(second.has_next())
+                self.assertFalse(set(first) & set(second))
+                back = self.client_follower.get(
+                    url, {"before": second.previous_cursor}
+                ).context["page_obj"]
+                self.assertEqual(list(back), list(first))
+
+    def test_broken_cursor_returns_first_page(self):
+        """Битый курсор не ломает страницу и ведет на начало ленты."""
+        response = self.client_follower.get(
+            reverse("posts:index"), {"after": "not-a-cursor"})
+        self.assertEqual(len(response.context["page_obj"]), 10)
+
+    def test_before_newest_post_returns_first_page(self):
+        """Курсор before у самого нового поста ведет на первую страницу,
+        а не на пустую страницу со ссылкой ?after=None."""
+        newest = Post.objects.order_by("-pub_date", "-id").first()
+        cursor = CursorPaginator(Post.objects.all(), 10).cursor_for(newest)
+        response = self.client_follower.get(reverse("posts:index"),
+                                            {"before": cursor})
+        page = response.context["page_obj"]
+        self.assertEqual(page[0], newest)
+        self.assertEqual(len(page), 10)
+        self.assertFalse(page.has_previous())
+        self.assertIsNotNone(page.next_cursor)
+        self.assertNotContains(response, "after=None")
+
+    def test_cursor_page_has_no_numbers(self):
+        """Номера соседних страниц у курсорной страницы дают InvalidPage."""
+        page = self.client_follower.get(
+            reverse("posts:index")).context["page_obj"]
+        with self.assertRaises(InvalidPage):
+            page.next_page_number()
+        with self.assertRaises(InvalidPage):
+            page.previous_page_number()
+
+
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
 class PostRenderTest(TestCase):
     @classmethod
@@ -228,6 +395,8 @@ class PostRenderTest(TestCase):
         shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
 
     def setUp(self):
+        # Откат транзакции теста не откатывает кэш страниц.
+        cache.clear()
         self.client = Client()
 
     def test_page_include_post(self):
@@ -331,3 +500,600 @@ class FollowsViewsTest(TestCase):
         objects_unfollow = response_unfollow.context["page_obj"].object_list
         self.assertIn(self.post, objects_follow)
         self.assertNotIn(self.post, objects_unfollow)
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username="author")
+        cls.user = User.objects.create_user(username="user")
+
+    def test_timeline_follows_subscriptions(self):
+        """Лента подписок заполняется при подписке и новом посте
+        и очищается при отписке."""
+        old_post = Post.objects.create(author=self.author, text="old post")
+        Follow.objects.create(user=self.user, author=self.author)
+        new_post = Post.objects.create(author=self.author, text="new post")
+        self.assertEqual(
+            list(self.user.timeline.values_list("post", flat=True)),
+            [new_post.pk, old_post.pk])
+        Follow.objects.filter(user=self.user, author=self.author).delete()
+        self.assertFalse(self.user.timeline.exists())
+
+    @override_settings(TIMELINE_BATCH_SIZE=2)
+    def test_backfill_keeps_all_posts(self):
+        """При подписке в ленту попадают все посты автора, а не только
+        последние."""
+        posts = Post.objects.bulk_create(
+            Post(author=self.author, text=f"post {i}") for i in range(5))
+        Follow.objects.create(user=self.user, author=self.author)
+        self.assertEqual(self.user.timeline.count(), len(posts))
+
+    def test_rebuild_timeline_command(self):
+        """Команда rebuild_timeline восстанавливает ленту по подпискам."""
+        post = Post.objects.create(author=self.author, text="post")
+        Follow.objects.create(user=self.user, author=self.author)
+        self.user.timeline.all().delete()
+        call_command("rebuild_timeline", stdout=StringIO())
+        self.assertEqual(
+            list(self.user.timeline.values_list("post", flat=True)),
+            [post.pk])
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username="author")
+        cls.user = User.objects.create_user(username="user")
+        cls.group = Group.objects.create(
+            title="test-group",
+            slug="test-slug",
+            description="test-description",
+        )
+        cls.group_other = Group.objects.create(
+            title="test-group-other",
+            slug="test-slug-other",
+            description="test-description",
+        )
+
+    def setUp(self):
+        self.client_author = Client()
+        self.client_author.force_login(self.author)
+        self.client_user = Client()
+        self.client_user.force_login(self.user)
+
+    def assertCounters(self, **expected):
+        self.author.stats.refresh_from_db()
+        self.user.stats.refresh_from_db()
+        self.group.refresh_from_db()
+        self.group_other.refresh_from_db()
+        actual = {
+            "author_posts": self.author.stats.posts_count,
+            "author_followers": self.author.stats.followers_count,
+            "user_following": self.user.stats.following_count,
+            "group_posts": self.group.posts_count,
+            "group_other_posts": self.group_other.posts_count,
+        }
+        self.assertEqual(actual, {**actual, **expected})
+
+    def test_counters_follow_views(self):
+        """Счетчики постов, групп, комментариев и подписок обновляются
+        при работе через представления."""
+        self.client_author.post(reverse("posts:post_create"),
+                                {"text": "post", "group": self.group.id})
+        post = Post.objects.get(text="post")
+        self.assertCounters(author_posts=1, group_posts=1)
+        self.client_author.post(
+            reverse("posts:post_edit", kwargs={"post_id": post.id}),
+            {"text": "post", "group": self.group_other.id})
+        self.assertCounters(group_posts=0, group_other_posts=1)
+        self.client_user.post(
+            reverse("posts:add_comment", kwargs={"post_id": post.id}),
+            {"text": "comment"})
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.client_user.get(reverse(
+            "posts:profile_follow", kwargs={"username": "author"}))
+        self.assertCounters(author_followers=1, user_following=1)
+        self.client_user.get(reverse(
+            "posts:profile_unfollow", kwargs={"username": "author"}))
+        self.assertCounters(author_followers=0, user_following=0)
+        post.delete()
+        self.assertCounters(author_posts=0, group_other_posts=0)
+
+    def test_profile_without_stats_shows_zero(self):
+        """Профиль автора без строки счетчиков показывает нули."""
+        AuthorStats.objects.filter(user=self.user).delete()
+        response = self.client_user.get(
+            reverse("posts:profile", kwargs={"username": "user"}))
+        self.assertContains(response, "Всего постов: 0")
+        self.assertContains(response, "Подписчиков: 0")
+
+    def test_recount_command_repairs_drift(self):
+        """Команда recount восстанавливает счетчики после bulk_create."""
+        Post.objects.bulk_create(
+            Post(author=self.author, text=f"post {i}", group=self.group)
+            for i in range(3)
+        )
+        self.assertCounters(author_posts=0, group_posts=0)
+        call_command("recount", stdout=StringIO())
+        self.assertCounters(author_posts=3, group_posts=3)
+
+
+class PostCardCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username="author")
+        cls.post = Post.objects.create(author=cls.author, text="old text")
+
+    def setUp(self):
+        cache.clear()
+        self.client_author = Client()
+        self.client_author.force_login(self.author)
+
+    def test_post_card_is_cached_until_edit(self):
+        """Карточка поста берется из кэша и обновляется после
+        редактирования."""
+        self.client_author.get(reverse("posts:index"))
+        self.assertIsNotNone(cache.get(post_card_key(self.post)))
+        Post.objects.filter(pk=self.post.pk).update(text="silent change")
+        response = self.client_author.get(reverse("posts:index"))
+        self.assertContains(response, "old text")
+        self.client_author.post(
+            reverse("posts:post_edit", kwargs={"post_id": self.post.id}),
+            {"text": "new text"})
+        self.assertIsNone(cache.get(post_card_key(self.post)))
+        response = self.client_author.get(reverse("posts:index"))
+        self.assertContains(response, "new text")
+
+
+    def test_post_card_follows_author_rename(self):
+        """После смены логина и имени автора карточка показывает новые
+        имя и ссылку на профиль."""
+        self.client_author.get(reverse("posts:index"))
+        author = User.objects.get(pk=self.author.pk)
+        author.username = "renamed"
+        author.first_name = "New"
+        author.last_name = "Name"
+        author.save()
+        response = self.client_author.get(reverse("posts:index"))
+        self.assertContains(response, "New Name")
+        self.assertContains(response, reverse(
+            "posts:profile", kwargs={"username": "renamed"}))
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_ASYNC=True)
+class ThumbnailTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username="author")
+        cls.post = Post.objects.create(
+            author=cls.author,
+            text="post with image",
+            image=SimpleUploadedFile(
+                name="thumb.gif",
+                content=(
+                    b"\x47\x49\x46\x38\x39\x61\x02\x00"
+                    b"\x01\x00\x80\x00\x00\x00\x00\x00"
+                    b"\xFF\xFF\xFF\x21\xF9\x04\x00\x00"
+                    b"\x00\x00\x00\x2C\x00\x00\x00\x00"
+                    b"\x02\x00\x01\x00\x00\x02\x02\x0C"
+                    b"\x0A\x00\x3B"
+                ),
+                content_type="image/gif",
+            ),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_placeholder_until_thumbnail_ready(self):
+        """Пока миниатюры нет, страница показывает заглушку и ставит
+        генерацию в очередь, а после генерации — картинку."""
+        with mock.patch.object(thumbnails, "schedule",
+                               return_value=False) as schedule:
+            response = self.client.get(reverse("posts:index"))
+        schedule.assert_called_with(self.post.image.name)
+        self.assertContains(response, "Изображение обрабатывается")
+        self.assertNotContains(response, "<img class=\"card-img")
+        thumbnails.mark_ready(self.post.image.name)
+        response = self.client.get(reverse("posts:index"))
+        self.assertNotContains(response, "Изображение обрабатывается")
+        self.assertContains(response, "<img class=\"card-img")
+
+    def test_cached_card_skips_thumbnails(self):
+        """Карточка из кэша не обращается к миниатюрам."""
+        Post.objects.filter(pk=self.post.pk).update(thumbnails_ready=True)
+        self.client.get(reverse("posts:index"))
+        with mock.patch.object(thumbnails, "ready_picture") as ready_picture:
+            self.client.get(reverse("posts:index"), {"page": 1})
+        ready_picture.assert_not_called()
+
+    def test_failed_generation_not_retried(self):
+        """Упавшая генерация не повторяется на каждом рендере."""
+        with mock.patch.object(thumbnails, "get_thumbnail",
+                               side_effect=OSError("broken")) as generate, \
+                self.assertLogs("posts.thumbnails", "ERROR"), \
+                override_settings(THUMBNAIL_ASYNC=False):
+            self.client.get(reverse("posts:index"))
+            self.client.get(reverse("posts:post_detail",
+                                    kwargs={"post_id": self.post.id}))
+        generate.assert_called_once()
+
+    def test_picture_srcset(self):
+        """Готовая картинка отдается в WebP и JPEG всех ширин."""
+        Post.objects.filter(pk=self.post.pk).update(thumbnails_ready=True)
+        response = self.client.get(
+            reverse("posts:post_detail", kwargs={"post_id": self.post.id}))
+        self.assertContains(response, '<source type="image/webp"')
+        content = response.content.decode()
+        for width in thumbnails.DERIVATIVE_WIDTHS:
+            with self.subTest(width=width):
+                self.assertIn(f".webp {width}w", content)
+                self.assertIn(f".jpg {width}w", content)
+
+    def test_post_edit_schedules_thumbnail(self):
+        """Сохранение поста ставит генерацию миниатюры в очередь."""
+        client = Client()
+        client.force_login(self.author)
+        with mock.patch.object(thumbnails, "schedule_for_post") as schedule:
+            client.post(reverse("posts:post_edit",
+                                kwargs={"post_id": self.post.id}),
+                        {"text": "edited"})
+        schedule.assert_called_once()
+
+
+class ConditionalGetTest(TransactionTestCase):
+    # Метки областей обновляются в on_commit, которого нет в TestCase.
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username="author")
+        self.group = Group.objects.create(
+            title="test-group",
+            slug="test-slug",
+            description="test-description",
+        )
+        self.post = Post.objects.create(author=self.author, group=self.group,
+                                        text="post")
+        self.urls = {
+            "index": reverse("posts:index"),
+            "group": reverse("posts:group_list",
+                             kwargs={"slug": self.group.slug}),
+            "profile": reverse("posts:profile",
+                               kwargs={"username": self.author.username}),
+            "detail": reverse("posts:post_detail",
+                              kwargs={"post_id": self.post.id}),
+        }
+
+    def etags(self, client=None):
+        client = client or self.client
+        return {name: client.get(url)["ETag"]
+                for name, url in self.urls.items()}
+
+    def test_not_modified(self):
+        """Повторный запрос с тем же ETag получает 304 без тела."""
+        for name, url in self.urls.items():
+            with self.subTest(name=name):
+                response = self.client.get(url)
+                self.assertTrue(response.has_header("Last-Modified"))
+                response = self.client.get(
+                    url, HTTP_IF_NONE_MATCH=response["ETag"])
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.content, b"")
+
+    def test_changes_update_etag(self):
+        """Новый пост и комментарий меняют ETag только своих областей."""
+        before = self.etags()
+        Post.objects.create(author=User.objects.create_user(username="other"),
+                            text="elsewhere")
+        after = self.etags()
+        self.assertNotEqual(before["index"], after["index"])
+        self.assertEqual(before["group"], after["group"])
+        self.assertEqual(before["profile"], after["profile"])
+        self.assertEqual(before["detail"], after["detail"])
+        Comment.objects.create(post=self.post, author=self.author,
+                               text="comment")
+        self.assertNotEqual(after["detail"], self.etags()["detail"])
+
+    def test_etag_depends_on_user(self):
+        """Гость и автор получают разные ETag одной страницы."""
+        client = Client()
+        client.force_login(self.author)
+        self.assertNotEqual(self.etags()["detail"],
+                            self.etags(client)["detail"])
+
+
+class PageCacheTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username="author")
+        Post.objects.create(author=self.author, text="first post")
+
+    def test_anonymous_page_cached_until_change(self):
+        """Гость получает страницу из кэша, а новый пост виден сразу."""
+        self.client.get(reverse("posts:index"))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse("posts:index"))
+        self.assertContains(response, "first post")
+        Post.objects.create(author=self.author, text="second post")
+        response = self.client.get(reverse("posts:index"))
+        self.assertContains(response, "second post")
+
+    def test_anonymous_page_follows_author_rename(self):
+        """Смена имени автора сбрасывает кэш страниц гостей."""
+        self.client.get(reverse("posts:index"))
+        self.author.first_name = "Renamed"
+        self.author.save()
+        response = self.client.get(reverse("posts:index"))
+        self.assertContains(response, "Renamed")
+
+    def test_authorized_page_not_cached(self):
+        """Страницы авторизованных пользователей не кэшируются целиком."""
+        client = Client()
+        client.force_login(self.author)
+        client.get(reverse("posts:index"))
+        response = client.get(reverse("posts:index"))
+        self.assertIsNotNone(response.context)
+
+    @override_settings(PAGE_CACHE_TIMEOUT=0)
+    def test_zero_timeout_disables_page_cache(self):
+        """PAGE_CACHE_TIMEOUT=0 отключает кэш страниц, но не ETag."""
+        self.client.get(reverse("posts:index"))
+        response = self.client.get(reverse("posts:index"))
+        self.assertIsNotNone(response.context)
+        self.assertTrue(response.has_header("ETag"))
+
+    @override_settings(CACHE_SINGLE_PROCESS=False)
+    def test_process_local_cache_disables_markers(self):
+        """С кэшем процесса без CACHE_SINGLE_PROCESS ETag и кэша нет."""
+        response = self.client.get(reverse("posts:index"))
+        self.assertFalse(response.has_header("ETag"))
+        response = self.client.get(reverse("posts:index"))
+        self.assertIsNotNone(response.context)
+
+
+class FeedsTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username="author")
+        self.group = Group.objects.create(
+            title="test-group", slug="test-slug", description="description")
+        Post.objects.create(author=self.author, group=self.group,
+                            text="first post")
+
+    def feed_urls(self):
+        return {
+            reverse("posts:group_rss", args=[self.group.slug]):
+                "application/rss+xml; charset=utf-8",
+            reverse("posts:group_atom", args=[self.group.slug]):
+                "application/atom+xml; charset=utf-8",
+            reverse("posts:profile_rss", args=[self.author.username]):
+                "application/rss+xml; charset=utf-8",
+            reverse("posts:profile_atom", args=[self.author.username]):
+                "application/atom+xml; charset=utf-8",
+        }
+
+    def test_feeds_streamed_with_posts(self):
+        """Ленты группы и автора отдаются потоком и содержат посты."""
+        for url, content_type in self.feed_urls().items():
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertTrue(response.streaming)
+                self.assertEqual(response["Content-Type"], content_type)
+                self.assertIn("first post",
+                              b"".join(response.streaming_content).decode())
+
+    def test_feed_cached_until_change(self):
+        """Повторный запрос берется из кэша, новый пост виден сразу."""
+        url = reverse("posts:group_rss", args=[self.group.slug])
+        b"".join(self.client.get(url).streaming_content)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertFalse(response.streaming)
+        self.assertContains(response, "first post")
+        Post.objects.create(author=self.author, group=self.group,
+                            text="second post")
+        response = self.client.get(url)
+        self.assertIn("second post",
+                      b"".join(response.streaming_content).decode())
+
+    def test_missing_group_feed(self):
+        """Лента несуществующей группы отвечает 404."""
+        response = self.client.get(reverse("posts:group_rss",
+                                           args=["missing"]))
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(COMMENTS_PER_PAGE=2)
+class CommentsPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username="author")
+        cls.post = Post.objects.create(author=cls.author, text="post")
+        cls.comments = [
+            Comment.objects.create(post=cls.post, author=cls.author,
+                                   text=f"comment {index}")
+            for index in range(5)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_post_page_shows_first_comments(self):
+        """На странице поста только первая страница комментариев."""
+        response = self.client.get(
+            reverse("posts:post_detail", args=[self.post.pk]))
+        self.assertEqual(list(response.context["comments"]),
+                         self.comments[:-3:-1])
+        self.assertContains(response, "Показать еще")
+
+    def test_load_more_walks_all_comments(self):
+        """Подгрузка по курсору отдает остальные комментарии без повторов."""
+        page = self.client.get(
+            reverse("posts:post_detail", args=[self.post.pk])
+        ).context["comments"]
+        seen = list(page)
+        while page.has_next():
+            response = self.client.get(
+                reverse("posts:post_comments", args=[self.post.pk]),
+                {"after": page.next_cursor})
+            self.assertTemplateNotUsed(response, "base.html")
+            page = response.context["comments"]
+            seen.extend(page)
+        self.assertEqual(seen, self.comments[::-1])
+
+    def test_missing_post_comments(self):
+        """Комментарии несуществующего поста отвечают 404."""
+        response = self.client.get(
+            reverse("posts:post_comments", args=[10 ** 6]))
+        self.assertEqual(response.status_code, 404)
+
+
+class CommentQueueTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username="author")
+        cls.reader = User.objects.create_user(username="reader")
+        cls.post = Post.objects.create(author=cls.author, text="post")
+
+    def setUp(self):
+        cache.clear()
+        queue_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, queue_dir, ignore_errors=True)
+        settings_override = override_settings(
+            COMMENT_QUEUE=True, COMMENT_QUEUE_DIR=queue_dir,
+            COMMENT_FLUSH_INTERVAL=None)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.detail_url = reverse("posts:post_detail", args=[self.post.pk])
+
+    def comment(self, text):
+        self.reader_client.post(
+            reverse("posts:add_comment", args=[self.post.pk]),
+            {"text": text})
+
+    def test_author_sees_queued_comment(self):
+        """Комментарий из очереди виден его автору, но не в базе."""
+        self.comment("queued comment")
+        self.assertFalse(Comment.objects.exists())
+        self.assertContains(self.reader_client.get(self.detail_url),
+                            "queued comment")
+        self.assertNotContains(self.client.get(self.detail_url),
+                               "queued comment")
+
+    def test_flush_moves_comments_to_database(self):
+        """flush_comments переносит очередь и обновляет счетчик."""
+        self.comment("first")
+        self.comment("second")
+        out = StringIO()
+        call_command("flush_comments", stdout=out)
+        self.assertIn("2", out.getvalue())
+        self.assertEqual(
+            sorted(Comment.objects.values_list("text", flat=True)),
+            ["first", "second"])
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 2)
+        response = self.reader_client.get(self.detail_url)
+        self.assertContains(response, "first", count=1)
+        self.assertEqual(self.reader_client.session["pending_comments"], [])
+
+    def test_comment_saved_during_flush_gets_date(self):
+        """Комментарий, сохраненный во время переноса очереди, получает
+        свою дату, а перенесенный — дату из журнала."""
+        self.comment("queued")
+        with open(comment_queue.queue_path(), encoding="utf-8") as stream:
+            queued_at = parse_datetime(json.loads(stream.read())["created"])
+        execute_sql = SQLInsertCompiler.execute_sql
+        direct = []
+
+        def insert_and_save(compiler, *args, **kwargs):
+            if compiler.query.model is Comment and not direct:
+                direct.append(None)
+                direct[0] = Comment.objects.create(
+                    post=self.post, author=self.author, text="direct")
+            return execute_sql(compiler, *args, **kwargs)
+
+        with mock.patch.object(SQLInsertCompiler, "execute_sql",
+                               insert_and_save):
+            self.assertEqual(comment_queue.flush(), 1)
+        direct[0].refresh_from_db()
+        self.assertGreater(direct[0].created, queued_at)
+        self.assertEqual(Comment.objects.get(text="queued").created,
+                         queued_at)
+
+    @override_settings(COMMENT_PENDING_MAX_AGE=0)
+    def test_old_records_for_other_posts_pruned(self):
+        """Старые записи сессии к другим постам убираются при просмотре
+        любого поста."""
+        other = Post.objects.create(author=self.author, text="other")
+        self.comment("queued comment")
+        self.reader_client.get(
+            reverse("posts:post_detail", args=[other.pk]))
+        self.assertEqual(self.reader_client.session["pending_comments"], [])
+
+    def test_reflush_does_not_duplicate(self):
+        """Повторный перенос того же журнала не дублирует комментарии."""
+        self.comment("once")
+        path = comment_queue.queue_path()
+        with open(path, encoding="utf-8") as stream:
+            journal = stream.read()
+        comment_queue.flush()
+        with open(path + ".crashed.flushing", "w",
+                  encoding="utf-8") as stream:
+            stream.write(journal)
+        self.assertEqual(comment_queue.flush(), 0)
+        self.assertEqual(Comment.objects.count(), 1)
+
+
+class SearchViewTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username="author")
+        cls.admin = User.objects.create_superuser(
+            username="admin", email="admin@example.com", password="admin")
+        cls.post_cats = Post.objects.create(
+            author=cls.author, text="Коты спят на подоконнике")
+        cls.post_dogs = Post.objects.create(
+            author=cls.author, text="Собаки гуляют во дворе")
+
+    def search(self, query):
+        response = self.client.get(reverse("posts:search"), {"q": query})
+        return list(response.context["page_obj"])
+
+    def test_search_finds_posts_by_words(self):
+        """Поиск находит посты по словам и префиксам."""
+        self.assertEqual(self.search("коты"), [self.post_cats])
+        self.assertEqual(self.search("собак"), [self.post_dogs])
+        self.assertEqual(self.search('"OR" ('), [])
+
+    def test_search_index_follows_edits(self):
+        """Индекс обновляется при изменении и удалении поста."""
+        Post.objects.filter(pk=self.post_dogs.pk).update(
+            text="Черепахи гуляют во дворе")
+        self.assertEqual(self.search("собаки"), [])
+        self.assertEqual(self.search("черепахи"), [self.post_dogs])
+        self.post_cats.delete()
+        self.assertEqual(self.search("коты"), [])
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке возвращает посты из полнотекстового индекса."""
+        self.client.force_login(self.admin)
+        response = self.client.get("/admin/posts/post/", {"q": "подоконник"})
+        self.assertEqual(list(response.context["cl"].result_list),
+                         [self.post_cats])
+        response = self.client.get("/admin/posts/post/", {"q": "!!!"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.context["cl"].result_list), [])
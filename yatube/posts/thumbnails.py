@@ -0,0 +1,208 @@
+"""Фоновая генерация миниатюр постов.
+
+Шаблоны больше не вызывают {% thumbnail %}, который декодирует и режет
+оригинал прямо во время запроса. Миниатюры считаются в пуле потоков
+сразу после сохранения поста, а шаблон показывает заглушку, пока у
+поста не выставлен флаг thumbnails_ready: рендер карточки не ходит ни в
+хранилище ключей sorl, ни к файлам. Неудачная генерация запоминается
+на THUMBNAIL_RETRY_AFTER секунд и до этого не повторяется.
+
+Для каждой картинки создается набор производных нескольких ширин в
+WebP и JPEG, которые шаблон отдает через <picture> и srcset.
+"""
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile
+
+from .storage import content_storage
+
+logger = logging.getLogger(__name__)
+
+# Без upscale: из маленького оригинала не раздуваются файлы на 1920px.
+POST_THUMBNAIL = ("960x339", {"crop": "center"})
+FAILED_PREFIX = "thumbnails:failed"
+DERIVATIVE_WIDTHS = (320, 640, 960, 1920)
+DERIVATIVE_FORMATS = {"WEBP": "image/webp", "JPEG": "image/jpeg"}
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = set()
+
+
+def derivatives():
+    """Производные (формат, ширина, геометрия, опции) в порядке генерации.
+
+    Пропорции и кадрирование те же, что у POST_THUMBNAIL; JPEG 960px
+    совпадает с ним и остается в src для браузеров без srcset.
+    """
+    geometry, options = POST_THUMBNAIL
+    width, height = map(int, geometry.split("x"))
+    return [
+        (format_, size, f"{size}x{round(size * height / width)}",
+         dict(options, format=format_))
+        for format_ in DERIVATIVE_FORMATS
+        for size in DERIVATIVE_WIDTHS
+    ]
+
+
+def source_file(image):
+    """Исходник для sorl по FieldFile или имени.
+
+    Класс хранилища входит в ключи и имена миниатюр, поэтому проверка
+    готовности, генерация и удаление должны видеть одно хранилище.
+    """
+    return ImageFile(getattr(image, "name", image), content_storage)
+
+
+class ReadyThumbnailBackend(ThumbnailBackend):
+    """Ищет готовую миниатюру в хранилище ключей, не создавая ее."""
+
+    def thumbnail_file(self, file_, geometry_string, **options):
+        """Миниатюра с вычисленным именем, без обращения к хранилищам."""
+        source = source_file(file_)
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault("format", self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return ImageFile(name, default.storage)
+
+    def get_ready_thumbnail(self, file_, geometry_string, **options):
+        return default.kvstore.get(
+            self.thumbnail_file(file_, geometry_string, **options))
+
+
+backend = ReadyThumbnailBackend()
+
+
+def ready_marker(image):
+    """Последняя по порядку производная: если она есть, готовы все."""
+    _, _, geometry, options = derivatives()[-1]
+    return backend.thumbnail_file(image, geometry, **options)
+
+
+class Picture:
+    """Производные картинки для <picture>: src, srcset и sources."""
+
+    def __init__(self, image):
+        srcsets = {}
+        for format_, size, geometry, options in derivatives():
+            url = backend.thumbnail_file(image, geometry, **options).url
+            srcsets.setdefault(format_, []).append(f"{url} {size}w")
+        self.sources = [
+            {"type": mime, "srcset": ", ".join(srcsets[format_])}
+            for format_, mime in DERIVATIVE_FORMATS.items()
+        ]
+        self.srcset = self.sources[-1]["srcset"]
+        geometry, options = POST_THUMBNAIL
+        self.url = backend.thumbnail_file(image, geometry, **options).url
+        self.name = ready_marker(image).name
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                thread_name_prefix="thumbnails",
+            )
+        return _executor
+
+
+def failed_key(name):
+    return f"{FAILED_PREFIX}:{hashlib.md5(name.encode()).hexdigest()}"
+
+
+def generate(name):
+    """Создает все производные для файла; возвращает успех."""
+    try:
+        for _, _, geometry, options in derivatives():
+            get_thumbnail(source_file(name), geometry, **options)
+    except Exception:
+        logger.exception("Не удалось создать миниатюры для %s", name)
+        cache.set(failed_key(name), True, settings.THUMBNAIL_RETRY_AFTER)
+        return False
+    return is_ready(name)
+
+
+def mark_ready(name):
+    """Отмечает посты с файлом; страницы с заглушкой устарели."""
+    from .caching import touch_posts
+    from .models import Post
+
+    posts = Post.objects.filter(image=name)
+    posts.update(thumbnails_ready=True)
+    touch_posts(posts)
+
+
+def _generate_in_worker(name):
+    try:
+        if generate(name):
+            mark_ready(name)
+    except Exception:
+        # Флаг выставится при следующем рендере, когда файлы уже есть.
+        logger.exception("Не удалось отметить миниатюры для %s", name)
+    finally:
+        with _executor_lock:
+            _pending.discard(name)
+        # У каждого рабочего потока свое соединение с базой.
+        connection.close()
+
+
+def schedule(name):
+    """Ставит генерацию в очередь один раз на файл.
+
+    Возвращает True, если миниатюры уже созданы (THUMBNAIL_ASYNC выключен).
+    """
+    if not name or cache.get(failed_key(name)):
+        return False
+    if not settings.THUMBNAIL_ASYNC:
+        if not generate(name):
+            return False
+        mark_ready(name)
+        return True
+    with _executor_lock:
+        if name in _pending:
+            return False
+        _pending.add(name)
+    _get_executor().submit(_generate_in_worker, name)
+    return False
+
+
+def schedule_for_post(post):
+    """Генерация после коммита, когда файл и запись уже сохранены."""
+    if post.image:
+        name = post.image.name
+        transaction.on_commit(lambda: schedule(name))
+
+
+def is_ready(image):
+    """Есть ли производные в хранилище ключей sorl (FieldFile или имя)."""
+    return bool(image) and default.kvstore.get(ready_marker(image)) is not None
+
+
+def ready_picture(post):
+    """Производные картинки поста или None; при промахе ставит генерацию.
+
+    Готовность берется из post.thumbnails_ready без обращения к sorl.
+    """
+    if not post.image:
+        return None
+    if not post.thumbnails_ready and not schedule(post.image.name):
+        return None
+    return Picture(post.image)
@@ -0,0 +1,70 @@
+from django.conf import settings
+from django.db import transaction
+
+from .models import Follow, Post, TimelineEntry
+
+
+def _entries_for(user_ids, post):
+    return [
+        TimelineEntry(user_id=user_id, post_id=post.pk,
+                      author_id=post.author_id, pub_date=post.pub_date)
+        for user_id in user_ids
+    ]
+
+
+def fan_out(post):
+    """Раскладывает новый пост в ленты всех подписчиков автора."""
+    follower_ids = Follow.objects.filter(
+        author_id=post.author_id).values_list("user_id", flat=True)
+    batch = []
+    for user_id in follower_ids.iterator():
+        batch.append(user_id)
+        if len(batch) >= settings.TIMELINE_BATCH_SIZE:
+            TimelineEntry.objects.bulk_create(_entries_for(batch, post),
+                                              ignore_conflicts=True)
+            batch = []
+    if batch:
+        TimelineEntry.objects.bulk_create(_entries_for(batch, post),
+                                          ignore_conflicts=True)
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту подписчика все посты нового автора.
+
+    Без ограничения по числу, как и миграция 0010: лента читается только
+    из TimelineEntry, и обрезанный хвост пропал бы из нее насовсем.
+    """
+    posts = Post.objects.filter(author_id=author_id).values_list(
+        "id", "pub_date")
+    batch = []
+    for post_id, pub_date in posts.iterator():
+        batch.append(TimelineEntry(user_id=user_id, post_id=post_id,
+                                   author_id=author_id, pub_date=pub_date))
+        if len(batch) >= settings.TIMELINE_BATCH_SIZE:
+            TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def trim(user_id, author_id):
+    """Убирает из ленты подписчика посты автора после отписки."""
+    TimelineEntry.objects.filter(user_id=user_id,
+                                 author_id=author_id).delete()
+
+
+@transaction.atomic
+def rebuild(user_ids=None):
+    """Пересобирает ленты целиком; возвращает число подписок."""
+    entries = TimelineEntry.objects.all()
+    follows = Follow.objects.all()
+    if user_ids is not None:
+        entries = entries.filter(user_id__in=user_ids)
+        follows = follows.filter(user_id__in=user_ids)
+    entries.delete()
+    rebuilt = 0
+    for user_id, author_id in follows.values_list(
+            "user_id", "author_id").iterator():
+        backfill(user_id, author_id)
+        rebuilt += 1
+    return rebuilt
@@ -1,5 +1,6 @@
 from django.urls import path
 
+from . import api, feeds
 from .views import *
 
 app_name = "posts"
@@ -9,10 +10,13 @@ urlpatterns = [
     path("group/<slug:slug>/", PostGroup.as_view(), name="group_list"),
     path("profile/<str:username>/", profile, name="profile"),
     path("posts/<int:post_id>/", PostDetailView.as_view(), name="post_detail"),
+    path("search/", search, name="search"),
     path("create/", post_create, name="post_create"),
     path("posts/<int:post_id>/edit/", post_edit, name="post_edit"),
     path("posts/<int:post_id>/comment/", add_comment,
          name="add_comment"),
+    path("posts/<int:post_id>/comments/", post_comments,
+         name="post_comments"),
     path("follow/", follow_index, name="follow_index"),
     path(
         "profile/<str:username>/follow/", profile_follow,
@@ -21,4 +25,22 @@ urlpatterns = [
     path("profile/<str:username>/unfollow/", profile_unfollow,
          name="profile_unfollow"
          ),
+    path("group/<slug:slug>/rss/", feeds.group_feed, {"feed_format": "rss"},
+         name="group_rss"),
+    path("group/<slug:slug>/atom/", feeds.group_feed,
+         {"feed_format": "atom"}, name="group_atom"),
+    path("profile/<str:username>/rss/", feeds.author_feed,
+         {"feed_format": "rss"}, name="profile_rss"),
+    path("profile/<str:username>/atom/", feeds.author_feed,
+         {"feed_format": "atom"}, name="profile_atom"),
+    path("api/posts/", api.posts, name="api_posts"),
+    path("api/posts/<int:post_id>/", api.post_detail, name="api_post"),
+    path("api/posts/<int:post_id>/comments/", api.post_comments,
+         name="api_post_comments"),
+    path("api/groups/", api.groups, name="api_groups"),
+    path("api/groups/<slug:slug>/posts/", api.group_posts,
+         name="api_group_posts"),
+    path("api/profiles/<str:username>/posts/", api.profile_posts,
+         name="api_profile_posts"),
+    path("api/follow/", api.follow_posts, name="api_follow"),
 ]
@@ -1,33 +1,74 @@
+from urllib.parse import urlencode
+
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.db import transaction
 from django.shortcuts import render, get_object_or_404, redirect
+from django.utils.decorators import method_decorator
 from django.views.generic import ListView, DetailView
 
+from . import comment_queue, thumbnails
+from .caching import FEED, conditional_page, forget_post_card, scope
 from .forms import PostForm, CommentForm
-from .models import Post, Group, Comment, Follow, User
+from .models import Post, Group, Comment, Follow, User, TimelineEntry
+from .paginators import (BoundedPaginator, CursorPaginationMixin,
+                         CursorPaginator, page_or_404, use_cursor_pagination)
+from .search import search_posts
 
 
 # POSTS_TO_OUTPUT = 10
 
 
-def get_paginator(args, request):
-    paginator = Paginator(args, settings.POSTS_TO_OUTPUT)
+def get_paginator(args, request, keys=("pub_date", "id"), scopes=(FEED,)):
+    if use_cursor_pagination(request):
+        paginator = CursorPaginator(args, settings.POSTS_TO_OUTPUT, keys)
+        return {
+            "page_number": None,
+            "page_obj": paginator.cursor_page(
+                after=request.GET.get("after"),
+                before=request.GET.get("before"),
+            ),
+        }
+    paginator = BoundedPaginator(args, settings.POSTS_TO_OUTPUT,
+                                 scopes=scopes, cursor_keys=keys)
     page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
+    page_obj = page_or_404(paginator, page_number)
     return {
         "page_number": page_number,
         "page_obj": page_obj,
     }
 
-class PostsHome(ListView):
+
+def feed_scopes(request):
+    return [FEED]
+
+
+def group_scopes(request, slug):
+    return [scope("group", slug)]
+
+
+def author_scopes(request, username):
+    return [scope("author", username)]
+
+
+def post_scopes(request, post_id):
+    # Страница поста показывает и число постов автора.
+    username = Post.objects.filter(pk=post_id).values_list(
+        "author__username", flat=True).first()
+    if username is None:
+        return None
+    return [scope("post", post_id), scope("author", username)]
+
+
+@method_decorator(conditional_page(feed_scopes), name="get")
+class PostsHome(CursorPaginationMixin, ListView):
     paginate_by = 10
     model = Post
     template_name = 'posts/index.html'
     # context_object_name = 'posts'
 
     def get_queryset(self):
-        return Post.objects.select_related("author").all()
+        return Post.objects.select_related("author", "group")
 
 # def index(request):
 #     template = "posts/index.html"
@@ -46,19 +87,31 @@ class PostsHome(ListView):
 #     }
 #     context.update(get_paginator(post_list, request))
 #     return render(request, template, context)
-class PostGroup(ListView):
+@method_decorator(conditional_page(group_scopes), name="get")
+class PostGroup(CursorPaginationMixin, ListView):
     paginate_by = 10
     model = Post
     template_name = 'posts/group_list.html'
 
     def get_queryset(self):
-        return get_object_or_404(Group, slug = self.kwargs['slug']).posts.all()
+        self.group = get_object_or_404(Group, slug=self.kwargs["slug"])
+        # post.group уже известен менеджеру связи, JOIN нужен только автору.
+        return self.group.posts.select_related("author")
 
+    def get_count_scopes(self):
+        return group_scopes(self.request, self.kwargs["slug"])
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["group"] = self.group
+        return context
 
 
+@conditional_page(author_scopes)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    post_list_user = author.posts.all()
+    author = get_object_or_404(User.objects.select_related("stats"),
+                               username=username)
+    post_list_user = author.posts.select_related("group")
     following = False
     if request.user.is_authenticated and author.following.filter(
             user=request.user).exists():
@@ -67,7 +120,8 @@ def profile(request, username):
         "author": author,
         "following": following
     }
-    context.update(get_paginator(post_list_user, request))
+    context.update(get_paginator(post_list_user, request,
+                                 scopes=author_scopes(request, username)))
     template = "posts/profile.html"
     return render(request, template, context)
 
@@ -88,35 +142,79 @@ def profile(request, username):
 #     template = "posts/post_detail.html"
 #     return render(request, template, context)
 
+@method_decorator(conditional_page(post_scopes), name="get")
 class PostDetailView(DetailView):
     model = Post
     template_name = "posts/post_detail.html"
     context_object_name = "post"
     pk_url_kwarg = "post_id"
 
+    def get_queryset(self):
+        return Post.objects.select_related("author__stats", "group")
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context["form"] = CommentForm(self.request.POST or None)
-        context["comments"] = self.object.comment.all()
+        comments = comments_page(self.object.pk)
+        # Свои комментарии из очереди автор видит до переноса в базу.
+        waiting = comment_queue.pending(self.request, self.object.pk)
+        if waiting:
+            comments.object_list = waiting + list(comments.object_list)
+        context["comments"] = comments
         context["author"] = False
         if self.request.user == self.object.author:
             context["author"] = True
         return context
 
+
+def comments_page(post_id, after=None):
+    """Страница комментариев поста, новые первыми, с авторами."""
+    paginator = CursorPaginator(
+        Comment.objects.filter(post_id=post_id).select_related("author"),
+        settings.COMMENTS_PER_PAGE, ("created", "id"))
+    return paginator.cursor_page(after=after)
+
+
+@conditional_page(lambda request, post_id: [scope("post", post_id)])
+def post_comments(request, post_id):
+    """Фрагмент со следующей страницей комментариев для «Показать еще»."""
+    get_object_or_404(Post.objects.only("pk"), pk=post_id)
+    context = {
+        "post_id": post_id,
+        "comments": comments_page(post_id, request.GET.get("after")),
+    }
+    return render(request, "includes/comments.html", context)
+
+
+def search(request):
+    query = request.GET.get("q", "").strip()
+    results = search_posts(query) if query else Post.objects.none()
+    paginator = BoundedPaginator(results, settings.POSTS_TO_OUTPUT)
+    context = {
+        "query": query,
+        "page_obj": page_or_404(paginator, request.GET.get("page")),
+        "pagination_params": urlencode({"q": query}) + "&",
+    }
+    return render(request, "posts/search.html", context)
+
+
 @login_required
+@transaction.atomic
 def post_create(request):
     template = "posts/create_post.html"
-    form = PostForm(request.POST or None)
+    form = PostForm(request.POST or None, files=request.FILES or None)
     if request.method == "POST":
         if form.is_valid():
             instance = form.save(commit=False)
             instance.author = request.user
             instance.save()
+            thumbnails.schedule_for_post(instance)
             return redirect("posts:profile", request.user.username)
     return render(request, template, {"form": form})
 
 
 @login_required()
+@transaction.atomic
 def post_edit(request, post_id):
     template = "posts/create_post.html"
     post = get_object_or_404(Post, id=post_id)
@@ -128,17 +226,24 @@ def post_edit(request, post_id):
     context = {"form": form, "is_edit": True}
     if request.user == post.author:
         if form.is_valid():
+            forget_post_card(post)
             post.save()
+            thumbnails.schedule_for_post(post)
             return redirect("posts:post_detail", post_id=post_id)
         return render(request, template, context)
     return redirect("posts:post_detail", post_id=post_id)
 
 
 @login_required
+@transaction.atomic
 def add_comment(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     form = CommentForm(request.POST or None)
-    if form.is_valid():
+    if form.is_valid() and settings.COMMENT_QUEUE:
+        record = comment_queue.enqueue(post.pk, request.user,
+                                       form.cleaned_data["text"])
+        comment_queue.remember(request, record)
+    elif form.is_valid():
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
@@ -148,15 +253,20 @@ def add_comment(request, post_id):
 
 @login_required
 def follow_index(request):
-    user = request.user
-    post_list = Post.objects.filter(
-        author__following__user=user)
+    entries = TimelineEntry.objects.filter(
+        user=request.user).select_related("post__author", "post__group")
     context = {"follow": True}
-    context.update(get_paginator(post_list, request))
+    # Подписки меняют ленту, но не трогают FEED.
+    context.update(get_paginator(
+        entries, request, ("pub_date", "post_id"),
+        [FEED, scope("author", request.user.username)]))
+    page_obj = context["page_obj"]
+    page_obj.object_list = [entry.post for entry in page_obj.object_list]
     return render(request, "posts/follow.html", context)
 
 
 @login_required
+@transaction.atomic
 def profile_follow(request, username):
     user = request.user
     author = get_object_or_404(User, username=username)
@@ -166,6 +276,7 @@ def profile_follow(request, username):
 
 
 @login_required
+@transaction.atomic
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
     follow = get_object_or_404(
@@ -0,0 +1,24 @@
+// «Показать еще»: подгружает следующую страницу комментариев на место
+// кнопки. Без JavaScript ссылка открывает тот же фрагмент целиком.
+document.addEventListener("click", function (event) {
+    var link = event.target.closest(".comments .load-more");
+    if (!link) {
+        return;
+    }
+    event.preventDefault();
+    link.classList.add("disabled");
+    fetch(link.href, {credentials: "same-origin"})
+        .then(function (response) {
+            if (!response.ok) {
+                throw new Error(response.status);
+            }
+            return response.text();
+        })
+        .then(function (html) {
+            link.insertAdjacentHTML("beforebegin", html);
+            link.remove();
+        })
+        .catch(function () {
+            link.classList.remove("disabled");
+        });
+});
@@ -49,6 +49,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.metrics.MetricsMiddleware',
+    'core.slow_queries.SlowQueryMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -65,7 +67,7 @@ TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.metrics.TimedTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -130,6 +132,11 @@ STATIC_URL = '/static/'
 
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 
+# Сюда складывает файлы collectstatic. При STATIC_SERVE Django сам отдает
+# их, выбирая .br/.gz копии (core.staticfiles); обычно это делает nginx.
+STATIC_ROOT = os.path.join(BASE_DIR, 'collected_static')
+STATIC_SERVE = False
+
 # yatube/settings.py
 
 LOGIN_URL = 'users:login'
@@ -142,16 +149,138 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 POSTS_TO_OUTPUT = 10
 
+# Номерная пагинация: дальше PAGINATOR_MAX_PAGES страниц лента листается
+# курсором. Число объектов кэшируется; с PAGINATOR_APPROXIMATE_COUNT
+# объектов устаревшее значение еще PAGINATOR_COUNT_MAX_AGE секунд
+# отдается сразу, а точное считается в фоне.
+PAGINATOR_MAX_PAGES = 200
+PAGINATOR_APPROXIMATE_COUNT = 10000
+PAGINATOR_COUNT_MAX_AGE = 5 * 60
+
+# Комментариев на странице поста и в каждой подгрузке «Показать еще».
+COMMENTS_PER_PAGE = 20
+
+# Буферизованная запись комментариев: add_comment дописывает журнал в
+# COMMENT_QUEUE_DIR, а фоновый поток раз в COMMENT_FLUSH_INTERVAL секунд
+# переносит его в базу пачками (None — только командой flush_comments).
+COMMENT_QUEUE = False
+COMMENT_QUEUE_DIR = os.path.join(BASE_DIR, 'comment_queue')
+COMMENT_FLUSH_INTERVAL = 1
+COMMENT_FLUSH_BATCH = 500
+# Сколько секунд автор видит из сессии свои комментарии к другим
+# постам; с запасом больше COMMENT_FLUSH_INTERVAL.
+COMMENT_PENDING_MAX_AGE = 60
+
+POSTS_CURSOR_PAGINATION = False
+
+# Материализованная лента подписок (posts.timeline)
+TIMELINE_BATCH_SIZE = 1000
+
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
-CACHES = {
-    'default': {
+# Кэш выбирается переменной окружения YATUBE_CACHE. locmem у каждого
+# процесса свой; file и sqlite общие для всех воркеров на машине.
+CACHE_BACKENDS = {
+    'locmem': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache'),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    'sqlite': {
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'cache.sqlite3'),
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+}
+
+CACHES = {
+    'default': CACHE_BACKENDS[os.environ.get('YATUBE_CACHE', 'locmem')],
 }
+
+# Метки изменений (posts.caching) должны быть видны всем воркерам. С
+# locmem запись отмечается только в обслужившем ее процессе, остальные
+# отдавали бы старые страницы и 304, поэтому ETag, кэш страниц, лент и
+# счетчиков с locmem работают только при одном процессе (runserver).
+# С file/sqlite настройка ни на что не влияет.
+CACHE_SINGLE_PROCESS = DEBUG
+
+# Сколько первых страниц главной и скольких крупных групп прогревает
+# команда warm_cache.
+CACHE_WARM_PAGES = 3
+CACHE_WARM_GROUPS = 10
+
+# Сколько хранится страница для гостей. Устаревшие копии отсекают метки
+# изменений, так что TTL только ограничивает объем кэша. 0 отключает кэш
+# страниц, условные GET по ETag остаются.
+PAGE_CACHE_TIMEOUT = 60 * 60
+
+# Сколько последних постов попадает в RSS/Atom группы и автора.
+FEED_ITEMS = 20
+
+# Загруженные картинки постов: исходник не больше POST_IMAGE_MAX_PIXELS,
+# хранится уменьшенным до POST_IMAGE_MAX_SIZE и перекодированным.
+POST_IMAGE_MAX_PIXELS = 50 * 1000 * 1000
+POST_IMAGE_MAX_SIZE = (2560, 2560)
+POST_IMAGE_QUALITY = 85
+
+# Картинки хранятся по хешу содержимого (posts.storage); файл без ссылок
+# из постов удаляется командой collect_images не раньше, чем через
+# IMAGE_COLLECT_GRACE секунд.
+IMAGE_COLLECT_GRACE = 60 * 60
+
+# Миниатюры постов создаются в фоновом пуле потоков, а не при рендере.
+THUMBNAIL_ASYNC = True
+THUMBNAIL_WORKERS = 2
+# Через сколько секунд повторять генерацию, которая упала.
+THUMBNAIL_RETRY_AFTER = 60 * 60
 INTERNAL_IPS = [
     '127.0.0.1',
 ]
+
+# Кому отдается /metrics/ и откуда его читает команда metrics_top.
+# С METRICS_TOKEN нужен заголовок "Authorization: Bearer <токен>", без
+# него — прямой запрос (без X-Forwarded-For) с METRICS_ALLOWED_IPS.
+METRICS_TOKEN = None
+METRICS_ALLOWED_IPS = ['127.0.0.1']
+METRICS_URL = 'http://127.0.0.1:8000/metrics/'
+
+# Запросы дольше порога (мс) пишутся с планом в logs/slow_queries.log;
+# None отключает журнал. Каталог создается при первой записи.
+# Параметры запросов могут содержать личные данные и по умолчанию
+# не пишутся.
+SLOW_QUERY_THRESHOLD_MS = 100
+SLOW_QUERY_LOG_PARAMS = False
+LOGS_DIR = os.path.join(BASE_DIR, 'logs')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'slow_queries': {
+            'format': '%(asctime)s %(message)s',
+        },
+    },
+    'handlers': {
+        'slow_queries': {
+            'class': 'core.slow_queries.LogFileHandler',
+            'filename': os.path.join(LOGS_DIR, 'slow_queries.log'),
+            'maxBytes': 10 * 1024 * 1024,
+            'backupCount': 5,
+            'encoding': 'utf-8',
+            'formatter': 'slow_queries',
+        },
+    },
+    'loggers': {
+        'yatube.slow_queries': {
+            'handlers': ['slow_queries'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
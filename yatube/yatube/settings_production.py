@@ -0,0 +1,73 @@
+"""
+Настройки для продакшена поверх yatube/settings.py.
+
+Выбираются переменной окружения YATUBE_ENV=production (см. manage.py и
+wsgi.py) или явно через DJANGO_SETTINGS_MODULE.
+"""
+
+import copy
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .settings import *  # noqa: F401,F403
+from .settings import (CACHE_BACKENDS, INSTALLED_APPS, MIDDLEWARE, TEMPLATES,
+                       os)
+
+# Ключ из репозитория не годится: без переменной окружения не стартуем.
+SECRET_KEY = os.environ.get('YATUBE_SECRET_KEY')
+if not SECRET_KEY:
+    raise ImproperlyConfigured(
+        'Задайте YATUBE_SECRET_KEY для продакшен-настроек.')
+
+DEBUG = False
+
+ALLOWED_HOSTS = os.environ.get(
+    'YATUBE_ALLOWED_HOSTS', 'localhost,127.0.0.1').split(',')
+
+SECURE_CONTENT_TYPE_NOSNIFF = True
+SECURE_BROWSER_XSS_FILTER = True
+
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app != 'debug_toolbar']
+
+MIDDLEWARE = [
+    middleware for middleware in MIDDLEWARE
+    if middleware != 'debug_toolbar.middleware.DebugToolbarMiddleware'
+]
+
+# Воркеров несколько: метки изменений и страницы должны лежать в общем
+# кэше (см. CACHE_SINGLE_PROCESS), поэтому по умолчанию sqlite.
+CACHES = {
+    'default': CACHE_BACKENDS[os.environ.get('YATUBE_CACHE', 'sqlite')],
+}
+CACHE_SINGLE_PROCESS = False
+
+# За прокси адрес клиента не проверить: /metrics/ только по токену.
+METRICS_TOKEN = os.environ.get('YATUBE_METRICS_TOKEN')
+METRICS_ALLOWED_IPS = []
+
+# Соединение живет между запросами вместо открытия на каждый запрос.
+DATABASES = copy.deepcopy(DATABASES)  # noqa: F405
+DATABASES['default']['CONN_MAX_AGE'] = int(
+    os.environ.get('YATUBE_CONN_MAX_AGE', 600))
+
+# Применяются к каждому новому соединению SQLite (core.db).
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
+}
+
+# Шаблоны компилируются один раз на процесс.
+TEMPLATES = copy.deepcopy(TEMPLATES)
+TEMPLATES[0]['APP_DIRS'] = False
+TEMPLATES[0]['OPTIONS']['loaders'] = [
+    ('django.template.loaders.cached.Loader', [
+        'django.template.loaders.filesystem.Loader',
+        'django.template.loaders.app_directories.Loader',
+    ]),
+]
+
+# collectstatic хеширует имена и пишет рядом сжатые .gz/.br копии.
+STATICFILES_STORAGE = 'core.staticfiles.CompressedManifestStaticFilesStorage'
+STATIC_SERVE = os.environ.get('YATUBE_SERVE_STATIC', '1') == '1'
@@ -1,7 +1,12 @@
+import re
+
 from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
+
+from core import staticfiles
+from core.views import metrics
 
 urlpatterns = [
     path("", include("posts.urls", namespace="posts")),
@@ -9,7 +14,13 @@ urlpatterns = [
     path('auth/', include('users.urls', namespace='users')),
     path("auth/", include('django.contrib.auth.urls')),
     path("admin/", admin.site.urls),
+    path("metrics/", metrics, name="metrics"),
 ]
+if settings.STATIC_SERVE:
+    urlpatterns += (re_path(
+        rf"^{re.escape(settings.STATIC_URL.lstrip('/'))}(?P<path>.*)$",
+        staticfiles.serve,
+    ),)
 if settings.DEBUG:
     urlpatterns += static(
         settings.MEDIA_URL, document_root=settings.MEDIA_ROOT
@@ -11,6 +11,10 @@ import os
 
 from django.core.wsgi import get_wsgi_application
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', (
+    'yatube.settings_production'
+    if os.environ.get('YATUBE_ENV') == 'production'
+    else 'yatube.settings'
+))
 
 application = get_wsgi_application()